@@ -10,29 +10,37 @@ Hanterar 'start'-meddelande för att explicit starta om sessionen.
 import os
 import json
 import logging
+import gzip
+import uuid
 import hashlib
-from flask import Blueprint, request, jsonify, send_from_directory, session
+from functools import lru_cache
+from flask import Blueprint, request, jsonify, send_from_directory, session, current_app
 from dotenv import load_dotenv
 import google.generativeai as genai
 import redis
 
+# Ladda miljövariabler före de lokala modulerna (diagnostics läser miljön när dekoratorerna körs)
+load_dotenv()
+
 # Importera parsing-funktioner och konstanter
 from parsing_utils import parse_ai_response, INTERACTIVE_KEYS
-
-# Ladda miljövariabler
-load_dotenv()
+from course_plan import load_course_plan
+from storage import get_storage, StorageError
+from diagnostics import trace_hot_path
+from logging_setup import log_event, configure_logging
 
 # Skapa en Blueprint för API-endpoints
 ai_bp = Blueprint('ai', __name__)
 
-# Konfigurera loggning
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Loggning konfigureras centralt (logging_setup.configure_logging i app.py)
 logger = logging.getLogger(__name__)
 
+# LLM-provider: 'gemini' (standard) eller 'fake' för benchmarks/replay utan API-anrop
+LLM_PROVIDER = os.getenv('LLM_PROVIDER', 'gemini').lower()
+
 # Hämta Gemini API-nyckeln från miljön
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-if not GEMINI_API_KEY:
+if not GEMINI_API_KEY and LLM_PROVIDER != 'fake':
     logger.error("GEMINI_API_KEY är inte definierat!")
     # raise ValueError("GEMINI_API_KEY is not defined in environment.")
 
@@ -53,6 +61,8 @@ admin_prompt_config = [
     {
         "title": "Användning av Utbildningsplanen",
         "content": "Du ska följa strukturen och täcka ämnena i den bifogade utbildningsplanen: `{education_plan}`.\n"
+                   "Planen ovan är ett **utdrag**: innehållsförteckningen visar hela kursen, men full text skickas bara för aktuell modul och modulerna närmast före/efter. "
+                   "När du går vidare till en ny modul, skriv ut dess **nummer och rubrik** (t.ex. \"7. Vanliga läkemedelsgrupper\") så att rätt del av planen följer med.\n"
                    "**MEN:** Utbildningsplanen är en **disposition/syllabus**, inte en komplett text. Ditt jobb är att **EXPANDERA** på varje punkt. Förklara begrepp, ge **detaljerade beskrivningar**, använd **relevanta exempel från vården i Skövde kommun** (om möjligt), och ställ **fördjupande frågor**. **Kopiera INTE text rakt av från planen.** Följ planens **ordning**."
     },
     {
@@ -211,6 +221,9 @@ image_assets = {
      "image14": { "url": f"{BACKEND_BASE_URL}/static/images/image14.png", "description": "Beskrivning bild 14"},
 }
 
+# Utbildningsplanen parsas en gång vid uppstart till ett modulindex
+COURSE_PLAN = load_course_plan()
+
 # --- Helper-funktioner (Oförändrade) ---
 def get_prompt_hash():
     prompt_json = json.dumps(admin_prompt_config, sort_keys=True)
@@ -236,10 +249,37 @@ def load_education_plan():
         return "Utbildningsplan saknas eller kunde inte laddas."
 
 
-def build_system_instruction(user_answers):
-    # ... (samma som förut) ...
-    background_text = build_background(user_answers)
-    education_plan_text = load_education_plan()
+def build_education_plan_context(current_module):
+    # Endast aktuell modul + grannar och en innehållsförteckning, inte hela planen
+    if COURSE_PLAN.modules:
+        return COURSE_PLAN.render_context(current_module)
+    return load_education_plan()
+
+
+def get_profile_key(user_answers):
+    # Prompten beror bara på dessa två svar, så de utgör cache-nyckeln per profil
+    return (user_answers.get('underskoterska', 'nej') == 'ja',
+            user_answers.get('delegering', 'nej') == 'ja')
+
+
+def _answers_for_profile(profile_key):
+    underskoterska, delegering = profile_key
+    return {'underskoterska': 'ja' if underskoterska else 'nej',
+            'delegering': 'ja' if delegering else 'nej'}
+
+
+def build_system_instruction(user_answers, current_module=0):
+    return _cached_system_instruction(get_profile_key(user_answers), COURSE_PLAN.clamp(current_module))
+
+
+# Prompten är statisk per process (admin_prompt_config ändras bara vid deploy),
+# så (profil, modul) räcker som nyckel: 4 profiler x antal moduler.
+# Spåras under cachen, så att diagnostiken mäter prompt-bygget vid cachemissar
+@lru_cache(maxsize=256)
+@trace_hot_path()
+def _cached_system_instruction(profile_key, current_module):
+    background_text = build_background(_answers_for_profile(profile_key))
+    education_plan_text = build_education_plan_context(current_module)
     instruction_parts = []
     for section in admin_prompt_config:
         content = section["content"]
@@ -279,12 +319,22 @@ def build_initial_history(user_answers, user_message, user_name):
     return greeting, history_for_session
 
 
-def get_gemini_model(user_answers):
-    # ... (samma som förut) ...
+@trace_hot_path()
+def get_gemini_model(user_answers, current_module=0):
+    return _cached_model(LLM_PROVIDER, get_profile_key(user_answers), COURSE_PLAN.clamp(current_module))
+
+
+# GenerativeModel är tillståndslöst mellan chattar (historiken ligger i ChatSession),
+# så en instans per (provider, profil, modul) återanvänds i stället för att byggas per request.
+@lru_cache(maxsize=256)
+def _cached_model(provider, profile_key, current_module):
+    system_instruction_text = _cached_system_instruction(profile_key, current_module)
+    if provider == 'fake':
+        from fake_llm import FakeGenerativeModel
+        return FakeGenerativeModel(system_instruction=system_instruction_text)
     if not GEMINI_API_KEY:
         raise ValueError("GEMINI_API_KEY är inte definierat.")
     genai.configure(api_key=GEMINI_API_KEY)
-    system_instruction_text = build_system_instruction(user_answers)
     model = genai.GenerativeModel(
         model_name='gemini-1.5-flash',
         system_instruction=system_instruction_text,
@@ -295,6 +345,7 @@ def get_gemini_model(user_answers):
     )
     return model
 
+@trace_hot_path()
 def convert_gemini_history_to_serializable(gemini_history):
     # ... (samma som förut) ...
     serializable_history = []
@@ -309,27 +360,54 @@ def convert_gemini_history_to_serializable(gemini_history):
              role = getattr(turn, 'role', 'unknown').lower()
              if role in ['user', 'model']:
                  serializable_history.append({'role': role, 'parts': serializable_parts})
-             else: logger.warning(f"Skipping history turn with unhandled role '{role}'")
-        else: logger.warning(f"Skipping history turn with no serializable parts")
+             else: log_event(logger, "history.turn_skipped", logging.WARNING, reason="unhandled_role", role=role)
+        else: log_event(logger, "history.turn_skipped", logging.WARNING, reason="no_serializable_parts")
     return serializable_history
 
+def load_saved_module():
+    """Hämtar sparad kursprogress när sessionskontexten byggs om (t.ex. efter ändrad prompt-hash)."""
+    user_id = session.get('user_id')
+    if user_id is None:
+        return 0
+    try:
+        return COURSE_PLAN.clamp(get_storage().get_progress(user_id) or 0)
+    except StorageError as storage_err:
+        logger.error(f"Could not load progress for user {user_id}: {storage_err}")
+        return 0
+
 # --- Huvud Chat Endpoint ---
 @ai_bp.route('/api/chat', methods=['POST'])
 def chat():
     data = request.get_json()
+    payload, status = run_chat_turn(data)
+    return jsonify(payload), status
+
+
+def run_chat_turn(data, allow_restart=True):
+    """
+    Kör en chattur mot sessionens kontext. Delas av /api/chat och /api/v2/chat.
+
+    Args:
+        data: {"message", "name", "answers"}.
+        allow_restart: Om "start" ska nollställa sessionen. False för v2-turer i en
+            pågående konversation, där "start" skickas till modellen som ett vanligt svar.
+
+    Returns:
+        (svarsdictionary, HTTP-statuskod)
+    """
     user_message = data.get('message', '')
     user_name = data.get('name', 'Användare') # Behövs endast för ny session/hälsning
 
     if not user_message:
-        return jsonify({"error": "Message cannot be empty"}), 400
+        return {"error": "Message cannot be empty"}, 400
 
     try:
         current_hash = get_prompt_hash()
         chat_session_obj = None
 
         # *** ÄNDRAD LOGIK: Hantera "start" FÖRST ***
-        if user_message.strip().lower() == "start":
-            logger.info("Received 'start' message. Clearing session and initializing.")
+        if allow_restart and user_message.strip().lower() == "start":
+            log_event(logger, "chat.start")
             session.pop('chat_context', None) # Rensa eventuell gammal session
 
             # Hämta user_answers från requesten *endast* för 'start'
@@ -339,12 +417,13 @@ def chat():
             # Skapa ny sessionkontext
             chat_context = {
                 'user_answers': user_answers,
+                'user_name': user_name,
                 'history': initial_history_serializable,
-                'hash': current_hash
+                'hash': current_hash,
+                'current_module': load_saved_module()
             }
             session['chat_context'] = chat_context
             session.modified = True
-            logger.info("Stored new initial context in session.")
 
             # Parse greeting och returnera
             parsed_greeting = parse_ai_response(initial_greeting)
@@ -354,65 +433,66 @@ def chat():
                      if key in INTERACTIVE_KEYS:
                          interactive_element = {"type": INTERACTIVE_KEYS[key], "data": parsed_greeting["interactiveJson"]}
                          break
-            return jsonify({"reply": {"textContent": parsed_greeting["textContent"], "interactiveElement": interactive_element}})
+            return {"reply": {"textContent": parsed_greeting["textContent"], "interactiveElement": interactive_element}}, 200
 
         # *** Om det INTE var "start", fortsätt som tidigare ***
         else:
             chat_context = session.get('chat_context')
 
             if chat_context and chat_context.get('hash') == current_hash:
-                logger.info(f"Existing session context found.")
                 retrieved_history = chat_context.get('history', [])
                 user_answers = chat_context.get('user_answers', {}) # Hämta sparade svar
+                current_module = COURSE_PLAN.clamp(chat_context.get('current_module', 0))
 
                 if not retrieved_history:
-                    logger.warning("Session context found, but history was empty. Re-initializing (should not happen often).")
+                    log_event(logger, "chat.context_reset", logging.WARNING, reason="empty_history")
                     # Fallback: Skapa helt ny session (liknande start-logiken men utan att returnera direkt)
                     session.pop('chat_context', None)
                     chat_context = None # Markera för att skapa nytt nedan
                 else:
                     try:
-                        model = get_gemini_model(user_answers)
+                        model = get_gemini_model(user_answers, current_module)
                         chat_session_obj = model.start_chat(history=retrieved_history)
-                        logger.info(f"Recreated chat session from history (length: {len(retrieved_history)}).")
+                        log_event(logger, "chat.session_restored", history_length=len(retrieved_history),
+                                  current_module=current_module)
                     except Exception as model_err:
                         logger.error(f"Error recreating Gemini session: {model_err}", exc_info=True)
                         chat_context = None # Nollställ för att skapa nytt nedan
 
             else: # Ingen session eller hash mismatch
-                if not chat_context: logger.info("No session context found. Creating new one.")
-                else: logger.info(f"Prompt hash changed. Creating new session.")
+                log_event(logger, "chat.context_reset", reason="prompt_hash_changed" if chat_context else "no_context")
                 session.pop('chat_context', None)
                 chat_context = None # Markera för att skapa nytt nedan
 
             # Skapa ny session om ingen giltig hittades/återskapades
             if chat_context is None:
-                logger.info("Initializing new chat session (outside of 'start').")
                 # Om vi hamnar här utanför 'start' (t.ex. första anropet efter /api/user, eller hash-ändring)
                 # behöver vi skapa initial kontext, men sen fortsätta med nuvarande meddelande.
                 current_user_answers = data.get('answers', {}) # Hämta från request om det är första anropet
                 _ , initial_history = build_initial_history(current_user_answers, "dummy", user_name) # Bygg historik men ignorera hälsning
                 chat_context = {
                     'user_answers': current_user_answers,
+                    'user_name': user_name,
                     'history': initial_history, # Börja med bara hälsningen från AI
-                    'hash': current_hash
+                    'hash': current_hash,
+                    'current_module': load_saved_module()
                 }
+                current_module = chat_context['current_module']
                 try:
-                    model = get_gemini_model(current_user_answers)
+                    model = get_gemini_model(current_user_answers, current_module)
                     chat_session_obj = model.start_chat(history=initial_history) # Starta med bara hälsningen
                     session['chat_context'] = chat_context # Spara den nya kontexten
                     session.modified = True
-                    logger.info("Stored new context for ongoing session.")
                 except Exception as model_err:
                      logger.error(f"Error starting new ongoing session: {model_err}", exc_info=True)
-                     return jsonify({"reply": {"textContent": "Kunde inte initiera chattsessionen.", "interactiveElement": None}}), 500
+                     return {"reply": {"textContent": "Kunde inte initiera chattsessionen.", "interactiveElement": None}}, 500
 
             # --- Generera AI-svar ---
             if not chat_session_obj:
                  logger.error("Chat session object is unexpectedly None.")
-                 return jsonify({"reply": {"textContent": "Ett oväntat sessionsfel inträffade.", "interactiveElement": None}}), 500
+                 return {"reply": {"textContent": "Ett oväntat sessionsfel inträffade.", "interactiveElement": None}}, 500
 
-            logger.info(f"Sending message to Gemini: '{user_message[:50]}...'")
+            log_event(logger, "chat.message_sent", message_chars=len(user_message), provider=LLM_PROVIDER)
             response = chat_session_obj.send_message(content=user_message)
 
             # Extrahera AI-svar (oförändrat)
@@ -423,26 +503,39 @@ def chat():
                      text_parts = [part.text for part in response.parts if hasattr(part, 'text') and part.text]
                      ai_reply_raw = "\n".join(text_parts).strip()
                 else:
-                     logger.warning(f"Unexpected response structure from Gemini: {response}")
+                     log_event(logger, "chat.unexpected_response", logging.WARNING, response_type=type(response).__name__)
                      ai_reply_raw = "Kunde inte generera ett svar just nu."
                 if not ai_reply_raw: ai_reply_raw = ""
             except Exception as extract_err:
                  logger.error(f"Error extracting text from Gemini response: {extract_err}")
                  ai_reply_raw = "Ett internt fel uppstod vid bearbetning av svaret."
 
-            logger.info(f"Received raw reply from Gemini: '{ai_reply_raw[:100]}...'")
+            log_event(logger, "chat.reply_received", reply_chars=len(ai_reply_raw))
+            # Utdrag ur modellsvaret (elevens konversation) loggas bara på DEBUG-nivå
+            log_event(logger, "chat.reply_preview", logging.DEBUG, preview=ai_reply_raw)
 
             # --- Uppdatera historiken i sessionen ---
             updated_history_gemini = chat_session_obj.history
             serializable_history = convert_gemini_history_to_serializable(updated_history_gemini)
             session['chat_context']['history'] = serializable_history
+
+            # --- Följ var i kursplanen eleven befinner sig ---
+            next_module = COURSE_PLAN.detect_module(ai_reply_raw, current_module)
+            if next_module != current_module:
+                log_event(logger, "chat.module_changed", from_module=current_module, to_module=next_module)
+            session['chat_context']['current_module'] = next_module
             session.modified = True
-            logger.info(f"Updated session history (length: {len(serializable_history)}). Context saved.")
+            user_id = session.get('user_id')
+            if user_id is not None and next_module != current_module:
+                try:
+                    get_storage().save_progress(user_id, next_module)
+                except StorageError as storage_err:
+                    # Progress är sekundär, chattsvaret ska fortfarande levereras
+                    logger.error(f"Could not save progress for user {user_id}: {storage_err}")
 
             # --- Parsa och returnera svar ---
             parsed_response = parse_ai_response(ai_reply_raw)
             # ... (resten av parse/response-logiken oförändrad) ...
-            logger.info(f"Parsed response. Text: '{parsed_response['textContent'][:100]}...', JSON found: {parsed_response['interactiveJson'] is not None}")
 
             interactive_element_response = None
             if parsed_response["interactiveJson"]:
@@ -453,12 +546,17 @@ def chat():
                             interactive_type = INTERACTIVE_KEYS[key]
                             break
                 elif parsed_response["interactiveJson"] is not None:
-                     logger.warning(f"Found JSON block, but it was not a dictionary: {type(parsed_response['interactiveJson'])}")
+                     log_event(logger, "chat.interactive_invalid", logging.WARNING,
+                               reason="not_a_dict", json_type=type(parsed_response['interactiveJson']).__name__)
 
                 if interactive_type:
                     interactive_element_response = {"type": interactive_type,"data": parsed_response["interactiveJson"]}
                 elif parsed_response["interactiveJson"] is not None:
-                    logger.warning(f"Parsed JSON did not contain a known interactive key: {list(parsed_response['interactiveJson'].keys()) if isinstance(parsed_response['interactiveJson'], dict) else 'N/A'}")
+                    log_event(logger, "chat.interactive_invalid", logging.WARNING, reason="unknown_key")
+
+            log_event(logger, "chat.turn_completed", history_length=len(serializable_history),
+                      interactive_type=interactive_element_response["type"] if interactive_element_response else None,
+                      current_module=next_module)
 
             final_response = {
                 "reply": {
@@ -466,24 +564,255 @@ def chat():
                     "interactiveElement": interactive_element_response
                 }
             }
-            return jsonify(final_response)
+            return final_response, 200
 
     # --- Felhantering (Generell) ---
     except ValueError as ve: # T.ex. saknad API-nyckel
         logger.error(f"Configuration error: {ve}")
-        return jsonify({"reply": {"textContent": "Ett konfigurationsfel inträffade.", "interactiveElement": None}}), 500
+        return {"reply": {"textContent": "Ett konfigurationsfel inträffade.", "interactiveElement": None}}, 500
     except redis.exceptions.ConnectionError as redis_err:
          logger.error(f"Redis connection error: {redis_err}", exc_info=True)
          session.pop('chat_context', None)
-         return jsonify({"reply": {"textContent": "Problem med anslutning till sessionen. Försök igen.", "interactiveElement": None}}), 503
+         return {"reply": {"textContent": "Problem med anslutning till sessionen. Försök igen.", "interactiveElement": None}}, 503
     except Exception as e:
         logger.error(f"Error during chat processing: {e}", exc_info=True)
-        return jsonify({"reply": {"textContent": "Ursäkta, ett oväntat problem uppstod.", "interactiveElement": None}}), 500
+        return {"reply": {"textContent": "Ursäkta, ett oväntat problem uppstod.", "interactiveElement": None}}, 500
+
+
+# --- Versionerat chatt-API (v2) ---
+# Klienten skickar conversationId och ett löpnummer (seq) per tur i stället för
+# namn/svar varje gång. Servern:
+# - returnerar sparat svar utan nytt modellanrop om samma seq skickas igen (retry),
+#   men bara om meddelandet är detsamma (hash sparas per seq), annars 409
+# - avvisar gamla eller överhoppade löpnummer med 409
+# - returnerar bara nytt innehåll (fält utan värde utelämnas)
+# Bara "start" utan conversationId/seq startar en ny konversation. Hälsningen ber
+# eleven skriva "start", så mitt i en konversation är det ett vanligt svar.
+INFLIGHT_LOCK_SECONDS = 130  # Något längre än gunicorns timeout
+
+
+def _v2_reply(conversation_id, seq, reply):
+    compact_reply = {key: value for key, value in reply.items() if value is not None}
+    return {"conversationId": conversation_id, "seq": seq, "reply": compact_reply}
+
+
+def _message_hash(message):
+    return hashlib.sha256(message.encode('utf-8')).hexdigest()[:16]
+
+
+def _acquire_turn_lock(conversation_id, seq):
+    # Hindrar att samtidiga retries av samma tur (t.ex. från olika noder) ger två modellanrop
+    redis_client = current_app.config.get('SESSION_REDIS')
+    if not redis_client:
+        return True, None
+    lock_key = f"chat-inflight:{conversation_id}:{seq}"
+    acquired = redis_client.set(lock_key, b"1", nx=True, ex=INFLIGHT_LOCK_SECONDS)
+    return bool(acquired), lock_key
+
+
+def _release_turn_lock(redis_client, lock_key):
+    try:
+        redis_client.delete(lock_key)
+    except redis.exceptions.RedisError as e:
+        # Låset löper ut av sig självt efter INFLIGHT_LOCK_SECONDS
+        logger.warning(f"Could not release turn lock {lock_key}: {e}")
+
+
+def _is_seq(value):
+    # bool är en subklass av int i Python, men true/false är inga giltiga löpnummer
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+@ai_bp.route('/api/v2/chat', methods=['POST'])
+def chat_v2():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    user_message = data.get('message', '')
+    conversation_id = data.get('conversationId')
+    seq = data.get('seq')
+    if not isinstance(user_message, str):
+        return jsonify({"error": "message must be a string"}), 400
+    if not user_message:
+        return jsonify({"error": "Message cannot be empty"}), 400
+    if (seq is not None and not _is_seq(seq)) or (conversation_id is not None and not isinstance(conversation_id, str)):
+        return jsonify({"error": "conversationId must be a string and seq an integer"}), 400
+
+    try:
+        if user_message.strip().lower() == "start" and conversation_id is None and seq is None:
+            payload, status = run_chat_turn(data)
+            if status != 200:
+                return jsonify(payload), status
+            conversation_id = uuid.uuid4().hex
+            response_payload = _v2_reply(conversation_id, 0, payload["reply"])
+            session['chat_context'].update({'conversation_id': conversation_id, 'seq': 0,
+                                            'last_message_hash': _message_hash(user_message),
+                                            'last_response': response_payload})
+            session.modified = True
+            return jsonify(response_payload)
+
+        if seq is None or not conversation_id:
+            return jsonify({"error": "conversationId and integer seq are required"}), 400
+
+        chat_context = session.get('chat_context') or {}
+        stored_id = chat_context.get('conversation_id')
+        stored_seq = chat_context.get('seq', 0)
+        if stored_id != conversation_id:
+            log_event(logger, "chat_v2.unknown_conversation", logging.WARNING,
+                      conversation_id=conversation_id, session_conversation_id=stored_id)
+            return jsonify({"error": "Unknown conversation", "code": "unknown_conversation"}), 409
+        if seq == stored_seq and chat_context.get('last_response'):
+            stored_hash = chat_context.get('last_message_hash')
+            if stored_hash and stored_hash != _message_hash(user_message):
+                log_event(logger, "chat_v2.seq_conflict", logging.WARNING, conversation_id=conversation_id, seq=seq)
+                return jsonify({"error": "Sequence number already used for another message",
+                                "code": "seq_conflict", "expectedSeq": stored_seq + 1}), 409
+            log_event(logger, "chat_v2.duplicate_turn", conversation_id=conversation_id, seq=seq)
+            return jsonify(chat_context['last_response'])
+        if seq != stored_seq + 1:
+            return jsonify({"error": "Stale or out-of-order turn", "code": "bad_seq",
+                            "expectedSeq": stored_seq + 1}), 409
+
+        acquired, lock_key = _acquire_turn_lock(conversation_id, seq)
+        if not acquired:
+            response = jsonify({"error": "Turn already in progress", "code": "in_progress"})
+            response.headers['Retry-After'] = '2'
+            return response, 409
+        redis_client = current_app.config.get('SESSION_REDIS')
+        release_now = True
+        try:
+            # Namn och bakgrundssvar finns i sessionen och skickas inte om av klienten
+            turn_data = {"message": user_message,
+                         "name": chat_context.get('user_name', 'Användare'),
+                         "answers": chat_context.get('user_answers', {})}
+            payload, status = run_chat_turn(turn_data, allow_restart=False)
+            if status != 200:
+                return jsonify(payload), status
+            response_payload = _v2_reply(conversation_id, seq, payload["reply"])
+            # Kontexten kan ha återskapats (t.ex. ändrad prompt-hash), behåll konversationens identitet
+            session['chat_context'].update({'conversation_id': conversation_id, 'seq': seq,
+                                            'last_message_hash': _message_hash(user_message),
+                                            'last_response': response_payload})
+            session.modified = True
+            response = jsonify(response_payload)
+            if lock_key:
+                # Flask-Session sparar seq/last_response först efter vyn. Släpp låset när svaret
+                # stängs, så att en retry i mellantiden får in_progress i stället för ett nytt modellanrop.
+                response.call_on_close(lambda: _release_turn_lock(redis_client, lock_key))
+                release_now = False
+            return response
+        finally:
+            if lock_key and release_now:
+                _release_turn_lock(redis_client, lock_key)
+    except redis.exceptions.ConnectionError as redis_err:
+        logger.error(f"Redis connection error: {redis_err}", exc_info=True)
+        return jsonify({"error": "Session store unavailable"}), 503
+
+
+# --- Återuppta session (utan modellanrop) ---
+RESUME_PAGE_SIZE = 50
+RESUME_MAX_PAGE_SIZE = 200
+
+
+def build_reply_from_raw(raw_text):
+    # Svaret loggades redan när det togs emot, så parse.*-event loggas inte igen här
+    parsed = parse_ai_response(raw_text, emit_logs=False)
+    interactive_element = None
+    if isinstance(parsed["interactiveJson"], dict):
+        for key in parsed["interactiveJson"]:
+            if key in INTERACTIVE_KEYS:
+                interactive_element = {"type": INTERACTIVE_KEYS[key], "data": parsed["interactiveJson"]}
+                break
+    return {"textContent": parsed["textContent"], "interactiveElement": interactive_element}
+
+
+@ai_bp.route('/api/chat/resume', methods=['GET'])
+def chat_resume():
+    """
+    Returnerar sparat transkript från sessionen, sidindelat bakifrån.
+
+    Query-parametrar:
+        limit: Antal meddelanden per sida (standard 50).
+        before: Index (exklusivt) att läsa bakåt från; utelämnas för senaste sidan.
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', RESUME_PAGE_SIZE)), 1), RESUME_MAX_PAGE_SIZE)
+        before = request.args.get('before')
+        before = int(before) if before is not None else None
+    except ValueError:
+        return jsonify({"error": "limit and before must be integers"}), 400
+
+    try:
+        chat_context = session.get('chat_context')
+    except redis.exceptions.ConnectionError as redis_err:
+        logger.error(f"Redis connection error: {redis_err}", exc_info=True)
+        return jsonify({"error": "Session store unavailable"}), 503
+
+    if not chat_context or chat_context.get('hash') != get_prompt_hash() or not chat_context.get('conversation_id'):
+        # Klienten startar en ny konversation med "start"
+        return jsonify({"resumable": False})
+
+    history = chat_context.get('history', [])
+    total = len(history)
+    end = total if before is None else max(0, min(before, total))
+    begin = max(0, end - limit)
+    messages = []
+    for index in range(begin, end):
+        turn = history[index]
+        text = "\n".join(part.get('text', '') for part in turn.get('parts', []))
+        if turn.get('role') == 'model':
+            reply = build_reply_from_raw(text)
+            messages.append({"index": index, "sender": "assistant", **reply})
+        else:
+            messages.append({"index": index, "sender": "user", "textContent": text, "interactiveElement": None})
+
+    current_module = COURSE_PLAN.clamp(chat_context.get('current_module', 0))
+
+    return jsonify({
+        "resumable": True,
+        "conversationId": chat_context['conversation_id'],
+        "seq": chat_context.get('seq', 0),
+        "currentModule": current_module,
+        "total": total,
+        "messages": messages,
+        "nextBefore": begin if begin > 0 else None,
+    })
+
+
+# --- Komprimering av API-svar ---
+COMPRESSION_ENABLED = os.getenv('CHAT_RESPONSE_COMPRESSION', 'true').lower() in ('true', '1')
+COMPRESSION_MIN_BYTES = int(os.getenv('CHAT_RESPONSE_COMPRESSION_MIN_BYTES', '1024'))
+try:
+    import brotli # Valfritt beroende
+except ImportError:
+    brotli = None
+
+
+@ai_bp.after_request
+def compress_response(response):
+    if (not COMPRESSION_ENABLED or response.direct_passthrough or response.status_code < 200
+            or response.status_code >= 300 or 'Content-Encoding' in response.headers):
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESSION_MIN_BYTES:
+        return response
+    accepted = request.headers.get('Accept-Encoding', '').lower()
+    if brotli is not None and 'br' in accepted:
+        response.set_data(brotli.compress(body, quality=5))
+        response.headers['Content-Encoding'] = 'br'
+    elif 'gzip' in accepted:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        return response
+    response.vary.add('Accept-Encoding')
+    return response
 
 
 # Lokal körning (oförändrad)
 if __name__ == '__main__':
     # ... (samma lokala körningskod som i förra svaret) ...
+     configure_logging()
      from flask import Flask
      from flask_cors import CORS
      from flask_session import Session
@@ -1,28 +1,31 @@
 # backend/app.py
 import os
+from dotenv import load_dotenv
+
+# Ladda miljövariabler före de lokala modulerna, som läser miljön vid import och konfiguration
+load_dotenv()
+
 from flask import Flask, jsonify, request, send_from_directory, session # Importera session
 from flask_cors import CORS
 from flask_session import Session
 import redis
-import sqlite3
 from ai import ai_bp
-from dotenv import load_dotenv
+from storage import get_storage, StorageError
+from diagnostics import init_diagnostics
 import logging
+from logging_setup import configure_logging, init_request_ids
 # from urllib.parse import urlparse # Behövs ej längre
 
-# Konfigurera loggning
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Konfigurera loggning (strukturerad JSON via kö, se logging_setup.py)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-# Ladda miljövariabler
-load_dotenv()
-
 # Define an absolute path to the base directory of the backend
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 # Initialize Flask app
 app = Flask(__name__, static_folder=os.path.join(basedir, 'static'))
+init_request_ids(app)
 
 # --- Flask-Session Configuration (Samma som förra, utan domain-logik) ---
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
@@ -49,9 +52,11 @@ else:
         logger.error(f"Error creating Redis client: {e}")
         app.config['SESSION_REDIS'] = None
 
-app.config['SESSION_COOKIE_SECURE'] = True
+# Secure kan stängas av för lokala benchmarks över http (SameSite=None kräver Secure)
+cookie_secure = os.getenv('SESSION_COOKIE_SECURE', 'true').lower() in ('true', '1')
+app.config['SESSION_COOKIE_SECURE'] = cookie_secure
 app.config['SESSION_COOKIE_HTTPONLY'] = True
-app.config['SESSION_COOKIE_SAMESITE'] = 'None'
+app.config['SESSION_COOKIE_SAMESITE'] = 'None' if cookie_secure else 'Lax'
 app.config['SESSION_COOKIE_PATH'] = '/'
 app.config['SESSION_COOKIE_DOMAIN'] = None # Explicit satt till None (default)
 
@@ -80,18 +85,23 @@ logger.info(f"Configuring CORS for origins: {cors_origins}")
 CORS(app, supports_credentials=True, origins=cors_origins)
 # -------------------------
 
-db_path = os.path.join(basedir, 'database.db')
 app.register_blueprint(ai_bp)
+init_diagnostics(app) # Gör inget om DIAGNOSTICS_ENABLED inte är satt
 
 def init_db():
-    # ... (samma som förut) ...
+     # Lagringsbackend väljs via DATABASE_URL (se storage.py). Lokal SQLite
+     # fungerar bara med en nod; flera noder kräver en delad SQL-server.
+     if not os.getenv('DATABASE_URL'):
+        logger.warning("DATABASE_URL not set, using local SQLite file. Not suitable for multiple backend nodes.")
+     storage = get_storage()
      try:
-        with sqlite3.connect(db_path) as conn:
-            c = conn.cursor()
-            c.execute('CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL)')
-            conn.commit()
-     except sqlite3.Error as e:
+        storage.init_schema()
+     except StorageError as e:
         logger.error(f"Database error during initialization: {e}")
+     finally:
+        # Körs vid import, dvs. i gunicorn-mastern med preload_app. Stäng processens
+        # anslutningar så att workers öppnar egna efter fork.
+        storage.close()
 
 init_db()
 
@@ -121,19 +131,18 @@ def save_user():
         logger.warning("Save user attempt failed: Name not provided.")
         return jsonify({'error': 'Name must be provided'}), 400
     try:
-        with sqlite3.connect(db_path) as conn:
-            c = conn.cursor()
-            c.execute('INSERT INTO users (name) VALUES (?)', (name,))
-            conn.commit()
+        user_id = get_storage().add_user(name)
 
         # *** ÄNDRING: Rensa chattkontexten när användare sparas ***
         session.pop('chat_context', None)
+        # Koppla sessionen till användaren så att progress kan sparas i delad lagring
+        session['user_id'] = user_id
         logger.info(f"User name saved: {name}. Cleared any existing chat context from session.")
         # Vi behöver inte sätta 'user_saved' längre, rensningen är viktigare.
         session.modified = True # Markera att sessionen ändrats (rensats)
 
         return jsonify({'message': 'Name saved successfully!'})
-    except sqlite3.Error as e:
+    except StorageError as e:
         logger.error(f"Database error saving user {name}: {e}")
         return jsonify({'error': 'Database error occurred'}), 500
     except Exception as e:
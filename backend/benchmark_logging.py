@@ -0,0 +1,117 @@
+# backend/benchmark_logging.py
+"""
+Mäter loggningens overhead per chattur i anropande tråd.
+
+Jämför:
+- legacy:  f-strängar med utdrag av modellsvaret och synkron StreamHandler (tidigare beteende)
+- sync:    log_event + JsonFormatter med synkron StreamHandler
+- queue:   log_event + NonBlockingQueueHandler (formatering och I/O i bakgrundstråd)
+- sampled: som queue, men med alla per-tur-event samplade till 10 %
+
+Utdata skrivs till /dev/null så att bara CPU-kostnaden i request-tråden mäts.
+Kön dimensioneras efter körningen så att inga poster kastas (dropped ska vara 0,
+annars mäts bortkastning i stället för loggning). Kolumnen "drained" är tiden per
+tur inklusive väntan på att lyssnartråden skrivit ut allt, dvs. total CPU-kostnad.
+
+Exempel:
+    python benchmark_logging.py --turns 20000
+"""
+
+import os
+import time
+import queue
+import argparse
+import logging
+
+import logging_setup
+from logging_setup import log_event, JsonFormatter, NonBlockingQueueHandler, RequestIdFilter
+from fake_llm import FAKE_REPLIES
+
+PER_TURN_EVENTS = ("chat.message_sent", "chat.reply_received", "chat.turn_completed", "parse.json_block")
+
+# Antal INFO-poster som structured_turn skriver per tur
+RECORDS_PER_TURN = 5
+
+
+def legacy_turn(logger, user_message, reply, history_length):
+    # Samma mönster som loggningen i ai.py/parsing_utils.py före den strukturerade loggningen
+    logger.info(f"Existing session context found.")
+    logger.info(f"Recreated chat session from history (length: {history_length}).")
+    logger.info(f"Sending message to Gemini: '{user_message[:50]}...'")
+    logger.info(f"Received raw reply from Gemini: '{reply[:100]}...'")
+    logger.info(f"Found potential JSON block. Raw string: '{reply[:100]}...'")
+    logger.info(f"Successfully parsed interactive JSON block.")
+    logger.info(f"Updated session history (length: {history_length + 2}). Context saved.")
+    logger.info(f"Parsed response. Text: '{reply[:100]}...', JSON found: True")
+
+
+def structured_turn(logger, user_message, reply, history_length):
+    log_event(logger, "chat.session_restored", history_length=history_length, current_module=3)
+    log_event(logger, "chat.message_sent", message_chars=len(user_message), provider="fake")
+    log_event(logger, "chat.reply_received", reply_chars=len(reply))
+    log_event(logger, "chat.reply_preview", logging.DEBUG, preview=reply)
+    log_event(logger, "parse.json_block", source="fenced_block", key="suggestions")
+    log_event(logger, "chat.turn_completed", history_length=history_length + 2,
+              interactive_type="suggestions", current_module=3)
+
+
+def run_mode(mode, turns):
+    logger = logging.getLogger(f"bench.{mode}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    devnull = open(os.devnull, "w")
+    stream_handler = logging.StreamHandler(devnull)
+    queue_handler = None
+
+    if mode == "legacy":
+        stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        handler = stream_handler
+        turn_fn = legacy_turn
+    else:
+        stream_handler.setFormatter(JsonFormatter())
+        if mode == "sync":
+            handler = stream_handler
+        else:
+            queue_size = max(logging_setup.LOG_QUEUE_SIZE, turns * RECORDS_PER_TURN)
+            queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size), [stream_handler])
+            queue_handler.start_listener()
+            handler = queue_handler
+        turn_fn = structured_turn
+    handler.addFilter(RequestIdFilter())
+    logger.addHandler(handler)
+
+    saved_rates = dict(logging_setup.SAMPLE_RATES)
+    if mode == "sampled":
+        logging_setup.SAMPLE_RATES.update({event: 0.1 for event in PER_TURN_EVENTS})
+
+    user_message = "Jag tycker att patientsäkerheten är viktigast eftersom..."
+    started = time.perf_counter()
+    for turn in range(turns):
+        turn_fn(logger, user_message, FAKE_REPLIES[turn % len(FAKE_REPLIES)], turn % 40)
+    elapsed = time.perf_counter() - started
+
+    if queue_handler is not None:
+        queue_handler.stop_listener()  # Väntar tills kön är tömd
+    drained = time.perf_counter() - started
+    logging_setup.SAMPLE_RATES.clear()
+    logging_setup.SAMPLE_RATES.update(saved_rates)
+    logger.removeHandler(handler)
+    devnull.close()
+    dropped = queue_handler.dropped if queue_handler is not None else 0
+    return elapsed / turns * 1e6, drained / turns * 1e6, dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-turn logging overhead.")
+    parser.add_argument("--turns", type=int, default=20000)
+    parser.add_argument("--modes", nargs="+", default=["legacy", "sync", "queue", "sampled"])
+    args = parser.parse_args()
+
+    print(f"{'mode':<10}{'us/turn':>10}{'drained':>10}{'dropped':>10}")
+    for mode in args.modes:
+        per_turn_us, drained_us, dropped = run_mode(mode, args.turns)
+        print(f"{mode:<10}{per_turn_us:>10.1f}{drained_us:>10.1f}{dropped:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+# backend/benchmark_profiles.py
+"""
+Jämför gunicorns serverprofiler (se gunicorn.conf.py) med den fejkade LLM:en.
+
+För varje profil startas gunicorn med LLM_PROVIDER=fake och riktiga
+Redis-sessioner. Ett antal samtidiga klienter för var sin konversation via
+/api/v2/chat under en fast tid, så sessionsåterställning, Redis-I/O och
+växande historik ingår i mätningen. Efteråt kontrolleras via
+/api/chat/resume att varje klients historik verkligen har vuxit.
+Genomströmning, latens och RSS (master + workers) rapporteras.
+
+Redis tas från REDIS_URL, annars startas en tillfällig redis-server lokalt.
+Secure-cookies stängs av eftersom benchmarken körs över http.
+
+Exempel:
+    python benchmark_profiles.py --profiles sync gthread gevent --clients 50 --duration 20
+"""
+
+import os
+import sys
+import time
+import shutil
+import signal
+import argparse
+import statistics
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def read_rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def child_pids(parent_pid):
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                # Fält 4 är ppid; processnamnet (fält 2) kan innehålla blanksteg
+                fields = f.read().rsplit(")", 1)[1].split()
+            if int(fields[1]) == parent_pid:
+                children.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return children
+
+
+def total_rss_mb(master_pid):
+    pids = [master_pid] + child_pids(master_pid)
+    return sum(read_rss_kb(pid) for pid in pids) / 1024.0, len(pids) - 1
+
+
+def wait_until_up(url, timeout_s=60):
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return True
+        except requests.RequestException:
+            time.sleep(0.3)
+    return False
+
+
+def start_local_redis(port):
+    redis_server = shutil.which("redis-server")
+    if not redis_server:
+        sys.exit("REDIS_URL is not set and redis-server was not found; cannot benchmark real sessions.")
+    proc = subprocess.Popen(
+        [redis_server, "--port", str(port), "--save", "", "--appendonly", "no"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    time.sleep(0.5)
+    return proc, f"redis://127.0.0.1:{port}/0"
+
+
+def client_loop(base_url, stop_at, latencies, errors, lock):
+    """Kör en konversation via v2-API:t och returnerar (antal lyckade turer, historiklängd)."""
+    http = requests.Session()
+    start = http.post(f"{base_url}/api/v2/chat", timeout=60, json={
+        "message": "start", "name": "Bench", "answers": {"underskoterska": "ja", "delegering": "nej"}})
+    if start.status_code != 200:
+        with lock:
+            errors.append(0.0)
+        return 0, 0
+    conversation_id = start.json()["conversationId"]
+    seq = 0
+    while time.time() < stop_at:
+        started = time.perf_counter()
+        try:
+            response = http.post(f"{base_url}/api/v2/chat", timeout=60, json={
+                "conversationId": conversation_id, "seq": seq + 1, "message": f"Svar nummer {seq + 1}"})
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors.append(elapsed)
+        if ok:
+            seq += 1
+    resume = http.get(f"{base_url}/api/chat/resume", params={"limit": 1}, timeout=60)
+    history_length = resume.json().get("total", 0) if resume.status_code == 200 else 0
+    return seq, history_length
+
+
+def run_profile(profile, args, redis_url):
+    port = str(args.port)
+    env = dict(os.environ, SERVING_PROFILE=profile, PORT=port, LLM_PROVIDER="fake",
+               FAKE_LLM_LATENCY_MS=str(args.latency_ms), DATABASE_URL="memory://",
+               REDIS_URL=redis_url, SESSION_COOKIE_SECURE="false")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        if not wait_until_up(base_url):
+            return {"profile": profile, "error": "server did not start"}
+        rss_idle, worker_count = total_rss_mb(proc.pid)
+
+        latencies, errors, lock = [], [], threading.Lock()
+        peak_rss = [rss_idle]
+        stop_at = time.time() + args.duration
+
+        def sample_rss():
+            while time.time() < stop_at:
+                peak_rss[0] = max(peak_rss[0], total_rss_mb(proc.pid)[0])
+                time.sleep(0.5)
+
+        sampler = threading.Thread(target=sample_rss, daemon=True)
+        sampler.start()
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            futures = [pool.submit(client_loop, base_url, stop_at, latencies, errors, lock)
+                       for _ in range(args.clients)]
+            conversations = [f.result() for f in futures]
+        sampler.join()
+
+        # Hälsning + (användare, modell) per lyckad tur; annars återskapades sessionen någonstans
+        history_ok = sum(1 for turns, length in conversations if turns and length == 1 + 2 * turns)
+
+        latencies.sort()
+        return {
+            "profile": profile,
+            "workers": worker_count,
+            "requests": len(latencies),
+            "errors": len(errors),
+            "rps": len(latencies) / args.duration,
+            "p50_ms": statistics.median(latencies) * 1000 if latencies else 0,
+            "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0,
+            "rss_idle_mb": rss_idle,
+            "rss_peak_mb": peak_rss[0],
+            "history_ok": history_ok,
+            "max_history": max((length for _, length in conversations), default=0),
+        }
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gunicorn serving profiles with the fake LLM.")
+    parser.add_argument("--profiles", nargs="+", default=["sync", "gthread", "gevent"])
+    parser.add_argument("--clients", type=int, default=50, help="Samtidiga klienter")
+    parser.add_argument("--duration", type=float, default=20.0, help="Sekunder per profil")
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="Simulerad LLM-latens")
+    parser.add_argument("--port", type=int, default=10099)
+    parser.add_argument("--redis-port", type=int, default=16399, help="Port för tillfällig redis-server")
+    args = parser.parse_args()
+
+    redis_proc = None
+    redis_url = os.getenv("REDIS_URL")
+    if not redis_url:
+        redis_proc, redis_url = start_local_redis(args.redis_port)
+    try:
+        results = [run_profile(profile, args, redis_url) for profile in args.profiles]
+    finally:
+        if redis_proc is not None:
+            redis_proc.terminate()
+            redis_proc.wait(timeout=10)
+
+    header = (f"{'profile':<10}{'workers':>8}{'reqs':>8}{'errors':>8}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}"
+              f"{'rss idle':>10}{'rss peak':>10}{'hist ok':>9}{'max hist':>9}")
+    print(header)
+    for r in results:
+        if "error" in r:
+            print(f"{r['profile']:<10} {r['error']}")
+            continue
+        print(f"{r['profile']:<10}{r['workers']:>8}{r['requests']:>8}{r['errors']:>8}{r['rps']:>9.1f}"
+              f"{r['p50_ms']:>9.0f}{r['p95_ms']:>9.0f}{r['rss_idle_mb']:>9.0f}M{r['rss_peak_mb']:>9.0f}M"
+              f"{r['history_ok']:>5}/{args.clients:<3}{r['max_history']:>9}")
+
+
+if __name__ == '__main__':
+    main()
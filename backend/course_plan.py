@@ -0,0 +1,232 @@
+# backend/course_plan.py
+"""
+Strukturerat index över utbildningsplanen (education_plan.txt).
+
+Planen parsas en gång vid uppstart till moduler (numrerade rubriker) och
+eventuella delavsnitt. Chattlagret använder indexet för att bara skicka med
+aktuell modul, dess grannar och en kompakt innehållsförteckning i
+systemprompten i stället för hela planen vid varje anrop.
+"""
+
+import os
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Matchar modulrubriker som "5. Ordinationshandling – Grunden för ..."
+MODULE_HEADER_REGEX = re.compile(r"^(\d{1,2})\.\s+(\S.*)$")
+
+# Ord som förekommer i fler moduler än så räknas inte som nyckelord
+MAX_KEYWORD_SPREAD = 2
+
+# Minsta antal unika nyckelordsträffar för att gå vidare till nästa modul via ordmatchning
+MIN_KEYWORD_HITS = 3
+
+# Andel av rubrikens ord som måste finnas i "N. <rubrik>" för att räknas som modulbyte
+MIN_TITLE_WORD_RATIO = 2 / 3
+
+# Kandidat till rubrikreferens: "N." följt av resten av raden
+HEADING_REFERENCE_REGEX = re.compile(r"(?<![\d.])(\d{1,2})\.[ \t]+([^\n]+)")
+
+# Antal moduler före/efter aktuell modul som tas med i prompten
+NEIGHBOUR_RADIUS = 1
+
+WORD_REGEX = re.compile(r"[a-zåäöéü]{4,}", re.IGNORECASE)
+
+
+def _tokenize(text):
+    return {word.lower() for word in WORD_REGEX.findall(text)}
+
+
+def _is_subsection_title(line, next_line):
+    """Ett delavsnitt är en kort, oindragen rad utan skiljetecken följd av en tom rad."""
+    if not line or line[0].isspace() or MODULE_HEADER_REGEX.match(line):
+        return False
+    stripped = line.strip()
+    return len(stripped) <= 60 and stripped[-1] not in ".:;!?" and not next_line.strip()
+
+
+class CoursePlan:
+    """
+    Indexerad utbildningsplan.
+
+    Attribut:
+        title: Planens övergripande rubrik (första raden).
+        modules: Lista med dictionaries:
+            {"number": int, "title": str, "text": str, "sections": [str],
+             "keywords": set[str]}
+        keyword_index: Mappning nyckelord -> set med modulindex.
+    """
+
+    def __init__(self, title, modules):
+        self.title = title
+        self.modules = modules
+        self.keyword_index = {}
+        self._number_to_index = {m["number"]: i for i, m in enumerate(modules)}
+        self._build_keyword_index()
+
+    def _build_keyword_index(self):
+        word_modules = {}
+        for index, module in enumerate(self.modules):
+            for word in _tokenize(module["title"] + "\n" + module["text"]):
+                word_modules.setdefault(word, set()).add(index)
+        # Behåll bara distinkta ord (som pekar ut en eller ett par moduler)
+        self.keyword_index = {
+            word: indices for word, indices in word_modules.items()
+            if len(indices) <= MAX_KEYWORD_SPREAD
+        }
+        for index, module in enumerate(self.modules):
+            module["keywords"] = {w for w, idx in self.keyword_index.items() if index in idx}
+
+    def __len__(self):
+        return len(self.modules)
+
+    def clamp(self, index):
+        if not self.modules:
+            return 0
+        try:
+            index = int(index)
+        except (TypeError, ValueError):
+            return 0
+        return max(0, min(index, len(self.modules) - 1))
+
+    def lookup(self, text):
+        """
+        Söker moduler via nyckelord.
+
+        Args:
+            text: Fri text (t.ex. ett AI-svar eller en användarfråga).
+
+        Returns:
+            Lista med (modulindex, antal träffar) sorterad med flest träffar först.
+        """
+        scores = {}
+        for word in _tokenize(text):
+            for index in self.keyword_index.get(word, ()):
+                scores[index] = scores.get(index, 0) + 1
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def detect_module(self, text, current_index):
+        """
+        Avgör vilken modul en text (normalt AI:ns svar) handlar om.
+
+        En explicit rubrikreferens ("7. Vanliga läkemedelsgrupper") vinner alltid, men
+        bara om numret följs av (största delen av) modulens rubrik, så att vanliga
+        numrerade listor inte räknas. Utan rubrikreferens kan ordmatchningen bara
+        flytta eleven till nästa modul, aldrig hoppa längre.
+
+        Returns:
+            Modulindex (oförändrat current_index om inget tydligt byte hittas).
+        """
+        current_index = self.clamp(current_index)
+        if not text or not self.modules:
+            return current_index
+
+        for match in HEADING_REFERENCE_REGEX.finditer(text):
+            index = self._number_to_index.get(int(match.group(1)))
+            if index is not None and self._matches_title(index, match.group(2)):
+                return index
+
+        next_index = current_index + 1
+        if next_index >= len(self.modules):
+            return current_index
+        hits = dict(self.lookup(text))
+        if hits.get(next_index, 0) >= MIN_KEYWORD_HITS and hits.get(next_index, 0) > hits.get(current_index, 0):
+            return next_index
+        return current_index
+
+    def _matches_title(self, index, heading_text):
+        title = self.modules[index]["title"]
+        title_words = _tokenize(title)
+        if not title_words:
+            return False
+        # Jämför bara med början av raden, inte med en hel efterföljande mening
+        leading_words = " ".join(heading_text.split()[:len(title.split()) + 2])
+        found = len(title_words & _tokenize(leading_words))
+        return found / len(title_words) >= MIN_TITLE_WORD_RATIO
+
+    def table_of_contents(self, current_index=None):
+        lines = []
+        for index, module in enumerate(self.modules):
+            marker = " <-- AKTUELL" if index == current_index else ""
+            lines.append(f"{module['number']}. {module['title']}{marker}")
+            if index == current_index:
+                # Delavsnitten visas bara för aktuell modul för att hålla förteckningen kort
+                lines.extend(f"   - {section}" for section in module['sections'])
+        return "\n".join(lines)
+
+    def render_module(self, index):
+        module = self.modules[index]
+        return f"{module['number']}. {module['title']}\n{module['text']}".rstrip()
+
+    def render_context(self, current_index, radius=NEIGHBOUR_RADIUS):
+        """
+        Bygger planutdraget som skickas i systemprompten: innehållsförteckning
+        plus full text för aktuell modul och dess grannar.
+        """
+        if not self.modules:
+            return ""
+        current_index = self.clamp(current_index)
+        first = max(0, current_index - radius)
+        last = min(len(self.modules) - 1, current_index + radius)
+        current = self.modules[current_index]
+        parts = [
+            self.title,
+            "Innehållsförteckning:\n" + self.table_of_contents(current_index),
+            f"Aktuell modul: {current['number']}. {current['title']}",
+            "Utdrag ur planen (aktuell modul med närliggande moduler):",
+        ]
+        parts.extend(self.render_module(i) for i in range(first, last + 1))
+        return "\n\n".join(part for part in parts if part)
+
+
+def parse_course_plan(raw_text):
+    """
+    Parar utbildningsplanens råtext till ett CoursePlan-objekt.
+
+    Args:
+        raw_text: Innehållet i education_plan.txt.
+
+    Returns:
+        CoursePlan (tom om inga numrerade moduler hittades).
+    """
+    lines = raw_text.splitlines()
+    title = ""
+    modules = []
+    current = None
+    for position, line in enumerate(lines):
+        header = MODULE_HEADER_REGEX.match(line)
+        if header:
+            current = {"number": int(header.group(1)), "title": header.group(2).strip(),
+                       "lines": [], "sections": []}
+            modules.append(current)
+            continue
+        if current is None:
+            if line.strip() and not title:
+                title = line.strip()
+            continue
+        next_line = lines[position + 1] if position + 1 < len(lines) else ""
+        if _is_subsection_title(line, next_line):
+            current["sections"].append(line.strip())
+        current["lines"].append(line.rstrip())
+
+    parsed_modules = [
+        {"number": m["number"], "title": m["title"],
+         "text": "\n".join(m["lines"]).strip(), "sections": m["sections"]}
+        for m in modules
+    ]
+    return CoursePlan(title, parsed_modules)
+
+
+def load_course_plan(file_path=None):
+    if file_path is None:
+        file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "education_plan.txt")
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            plan = parse_course_plan(f.read())
+        logger.info(f"Loaded course plan with {len(plan)} modules from {file_path}")
+        return plan
+    except Exception as e:
+        logger.error(f"Kunde inte läsa utbildningsplanen från {file_path}: {e}")
+        return CoursePlan("", [])
@@ -0,0 +1,249 @@
+# backend/diagnostics.py
+"""
+Valbart diagnostikläge för minnes- och prestandafelsökning.
+
+Av som standard. Aktiveras med DIAGNOSTICS_ENABLED=true och ger då:
+- tracemalloc-snapshots var N:e request (DIAGNOSTICS_SNAPSHOT_EVERY), diffade mot föregående
+- allokeringsräknare per route (nettoförändring av spårat minne under requesten)
+- tids-/allokeringsräknare för heta funktioner markerade med @trace_hot_path
+- valfri samplingsprofilerare (DIAGNOSTICS_SAMPLING_INTERVAL_MS > 0)
+- GET /debug/profile som dumpar resultaten, skyddad med DIAGNOSTICS_TOKEN
+  (skickas i headern X-Debug-Token)
+
+När läget är avstängt registreras inga hooks och @trace_hot_path returnerar
+funktionen oförändrad, så overhead i produktion är i praktiken noll.
+
+Inställningarna läses från miljön när init_diagnostics() anropas (och när
+@trace_hot_path appliceras), inte vid import, så värden från .env gäller så
+länge load_dotenv() har körts innan dess.
+
+Obs: tracemalloc mäter hela processen, så med gthread-workers blandas
+allokeringar från samtidiga requests in i per-route-siffrorna. Kör med
+GUNICORN_THREADS=1 för exakta värden.
+"""
+
+import os
+import sys
+import hmac
+import time
+import logging
+import threading
+import functools
+import tracemalloc
+from collections import Counter
+
+from flask import Blueprint, jsonify, request, g
+
+logger = logging.getLogger(__name__)
+
+# Sätts av _load_settings() i init_diagnostics()
+DIAGNOSTICS_ENABLED = False
+DIAGNOSTICS_TOKEN = ''
+SNAPSHOT_EVERY = 100
+TRACEMALLOC_FRAMES = 10
+SAMPLING_INTERVAL_MS = 0.0
+TOP_N = 25
+MAX_SNAPSHOT_DIFFS = 10
+
+debug_bp = Blueprint('debug', __name__)
+
+_lock = threading.Lock()
+_request_count = 0
+_previous_snapshot = None
+_snapshot_diffs = []  # Senaste diffarna, äldst först
+_route_stats = {}     # endpoint -> {"count", "alloc_bytes", "max_alloc_bytes", "total_ms"}
+_hot_path_stats = {}  # funktionsnamn -> {"count", "alloc_bytes", "total_ms"}
+_sampler = None
+_sampler_pid = None
+
+
+def _enabled_from_env():
+    return os.getenv('DIAGNOSTICS_ENABLED', 'false').lower() in ('true', '1')
+
+
+def _load_settings():
+    global DIAGNOSTICS_ENABLED, DIAGNOSTICS_TOKEN, SNAPSHOT_EVERY, TRACEMALLOC_FRAMES, SAMPLING_INTERVAL_MS, TOP_N
+    DIAGNOSTICS_ENABLED = _enabled_from_env()
+    DIAGNOSTICS_TOKEN = os.getenv('DIAGNOSTICS_TOKEN', '')
+    SNAPSHOT_EVERY = int(os.getenv('DIAGNOSTICS_SNAPSHOT_EVERY', '100'))
+    TRACEMALLOC_FRAMES = int(os.getenv('DIAGNOSTICS_TRACEMALLOC_FRAMES', '10'))
+    SAMPLING_INTERVAL_MS = float(os.getenv('DIAGNOSTICS_SAMPLING_INTERVAL_MS', '0'))
+    TOP_N = int(os.getenv('DIAGNOSTICS_TOP_N', '25'))
+
+
+def trace_hot_path(name=None):
+    """
+    Dekorator som räknar anrop, tid och spårade allokeringar för en funktion.
+
+    Returnerar funktionen oförändrad när diagnostikläget är avstängt. Miljön läses
+    när dekoratorn appliceras, dvs. när den dekorerade modulen importeras.
+    """
+    def decorator(func):
+        if not _enabled_from_env():
+            return func
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            mem_before = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                mem_after = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+                with _lock:
+                    stats = _hot_path_stats.setdefault(label, {"count": 0, "alloc_bytes": 0, "total_ms": 0.0})
+                    stats["count"] += 1
+                    stats["alloc_bytes"] += mem_after - mem_before
+                    stats["total_ms"] += elapsed_ms
+        return wrapper
+    return decorator
+
+
+class SamplingProfiler:
+    """Enkel samplingsprofilerare: räknar vilka funktioner som står överst i trådarnas stackar."""
+
+    def __init__(self, interval_ms):
+        self.interval = interval_ms / 1000.0
+        self.samples = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='diagnostics-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with _lock:
+                self.sample_count += 1
+                for thread_id, frame in frames.items():
+                    if thread_id == own_ident:
+                        continue
+                    code = frame.f_code
+                    self.samples[f"{code.co_filename}:{frame.f_lineno} {code.co_name}"] += 1
+
+    def top(self, limit):
+        return [{"location": loc, "samples": count} for loc, count in self.samples.most_common(limit)]
+
+
+def _take_snapshot_diff():
+    global _previous_snapshot
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    if _previous_snapshot is not None:
+        stats = snapshot.compare_to(_previous_snapshot, 'lineno')
+        _snapshot_diffs.append({
+            "request_count": _request_count,
+            "timestamp": time.time(),
+            "top": [{
+                "location": str(stat.traceback[0]) if stat.traceback else "?",
+                "size_diff_bytes": stat.size_diff,
+                "size_bytes": stat.size,
+                "count_diff": stat.count_diff,
+            } for stat in stats[:TOP_N]],
+        })
+        del _snapshot_diffs[:-MAX_SNAPSHOT_DIFFS]
+    _previous_snapshot = snapshot
+
+
+def _ensure_sampler():
+    # Trådar överlever inte fork, så profileraren startas i varje worker (inte i gunicorn-mastern)
+    global _sampler, _sampler_pid
+    if _sampler_pid == os.getpid():
+        return
+    with _lock:
+        if _sampler_pid != os.getpid():
+            _sampler = SamplingProfiler(SAMPLING_INTERVAL_MS)
+            _sampler.start()
+            _sampler_pid = os.getpid()
+
+
+def _before_request():
+    if SAMPLING_INTERVAL_MS > 0:
+        _ensure_sampler()
+    g.diag_started = time.perf_counter()
+    g.diag_mem_before = tracemalloc.get_traced_memory()[0]
+
+
+def _after_request(response):
+    global _request_count
+    started = getattr(g, 'diag_started', None)
+    if started is None:
+        return response
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    alloc = tracemalloc.get_traced_memory()[0] - g.diag_mem_before
+    endpoint = request.endpoint or 'unknown'
+    take_snapshot = False
+    with _lock:
+        stats = _route_stats.setdefault(endpoint, {"count": 0, "alloc_bytes": 0, "max_alloc_bytes": 0, "total_ms": 0.0})
+        stats["count"] += 1
+        stats["alloc_bytes"] += alloc
+        stats["max_alloc_bytes"] = max(stats["max_alloc_bytes"], alloc)
+        stats["total_ms"] += elapsed_ms
+        _request_count += 1
+        take_snapshot = SNAPSHOT_EVERY > 0 and _request_count % SNAPSHOT_EVERY == 0
+    if take_snapshot:
+        try:
+            with _lock:
+                _take_snapshot_diff()
+        except Exception as e:
+            logger.error(f"Failed to take tracemalloc snapshot: {e}")
+    return response
+
+
+@debug_bp.route('/debug/profile', methods=['GET'])
+def debug_profile():
+    supplied = request.headers.get('X-Debug-Token', '')
+    if not DIAGNOSTICS_TOKEN or not hmac.compare_digest(supplied, DIAGNOSTICS_TOKEN):
+        return jsonify({"error": "Forbidden"}), 403
+    current, peak = tracemalloc.get_traced_memory()
+    with _lock:
+        payload = {
+            "pid": os.getpid(),
+            "request_count": _request_count,
+            "traced_memory_bytes": current,
+            "traced_memory_peak_bytes": peak,
+            "routes": {k: dict(v) for k, v in _route_stats.items()},
+            "hot_paths": {k: dict(v) for k, v in _hot_path_stats.items()},
+            "snapshot_diffs": list(_snapshot_diffs),
+            "sampling": {
+                "interval_ms": SAMPLING_INTERVAL_MS,
+                "sample_count": _sampler.sample_count,
+                "top": _sampler.top(TOP_N),
+            } if _sampler else None,
+        }
+    if request.args.get('reset', '').lower() in ('true', '1'):
+        with _lock:
+            _route_stats.clear()
+            _hot_path_stats.clear()
+            _snapshot_diffs.clear()
+            if _sampler:
+                _sampler.samples.clear()
+    return jsonify(payload)
+
+
+def init_diagnostics(app):
+    """Läser DIAGNOSTICS_* och registrerar diagnostik-hooks på appen om DIAGNOSTICS_ENABLED är satt."""
+    _load_settings()
+    if not DIAGNOSTICS_ENABLED:
+        return
+    if not DIAGNOSTICS_TOKEN:
+        logger.warning("DIAGNOSTICS_ENABLED is set but DIAGNOSTICS_TOKEN is empty; /debug/profile will refuse all requests.")
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.register_blueprint(debug_bp)
+    logger.warning(
+        f"Diagnostics mode ENABLED (snapshot every {SNAPSHOT_EVERY} requests, "
+        f"sampling interval {SAMPLING_INTERVAL_MS} ms). Expect extra CPU and memory overhead."
+    )
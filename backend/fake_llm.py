@@ -0,0 +1,83 @@
+# backend/fake_llm.py
+"""
+Fejkad LLM-provider som efterliknar de delar av google.generativeai som ai.py använder
+(GenerativeModel.start_chat, ChatSession.send_message/history, response.text).
+
+Aktiveras med LLM_PROVIDER=fake och används för benchmarks och replay utan
+nätverksanrop eller API-kostnad. Svarstiden styrs med FAKE_LLM_LATENCY_MS för att
+simulera I/O-väntan mot Gemini.
+"""
+
+import os
+import time
+import json
+import hashlib
+
+FAKE_LLM_LATENCY_MS = float(os.getenv('FAKE_LLM_LATENCY_MS', '800'))
+
+# Roterande svar som täcker ren text och de vanligaste interaktiva formaten
+FAKE_REPLIES = [
+    "Bra! Vi börjar med **1. Introduktion & Bakgrund**. Delegering innebär att en person med formell "
+    "kompetens överlåter en uppgift till någon med reell kompetens. Vad tänker du om detta? Skriv ditt svar i rutan nedan.",
+    "Här kommer en fråga:\n```json\n" + json.dumps({"suggestions": {
+        "text": "Kan en delegering gälla längre än ett år?",
+        "options": [{"label": "Ja", "value": "ja"}, {"label": "Nej", "value": "nej"}]}}, ensure_ascii=False) + "\n```\nVälj ett alternativ.",
+    "Dags för ett scenario:\n```json\n" + json.dumps({"scenario": {
+        "title": "Dospåsen stämmer inte",
+        "description": "Du ser att dospåsens innehåll inte stämmer med ordinationshandlingen. Vad gör du?",
+        "options": [{"label": "Ger läkemedlet ändå", "value": "optionA"},
+                    {"label": "Kontaktar sjuksköterskan", "value": "optionB"}]}}, ensure_ascii=False) + "\n```",
+    "```json\n" + json.dumps({"multipleChoice": {
+        "text": "Vilka uppgifter finns i en ordinationshandling?",
+        "options": [{"id": "A", "text": "Läkemedlets namn"}, {"id": "B", "text": "Patientens favoritmat"}],
+        "multiSelect": True}}, ensure_ascii=False) + "\n```",
+    "Helt rätt! Vi går vidare till **3. Centrala principer för delegering**: patientsäkerhet, kompetens, "
+    "frivillighet och dokumentation. Vilken princip tycker du är viktigast? Skriv ditt svar i rutan nedan.",
+]
+
+
+class FakePart:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeContent:
+    def __init__(self, role, text):
+        self.role = role
+        self.parts = [FakePart(text)]
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+        self.parts = [FakePart(text)]
+
+
+class FakeChatSession:
+    def __init__(self, model, history=None):
+        self.model = model
+        self.history = []
+        for turn in history or []:
+            text = "\n".join(part.get('text', '') for part in turn.get('parts', []))
+            self.history.append(FakeContent(turn.get('role', 'user'), text))
+
+    def send_message(self, content):
+        if self.model.latency_ms > 0:
+            time.sleep(self.model.latency_ms / 1000.0)
+        # Deterministiskt val så att samma transkript ger samma svar vid replay
+        digest = hashlib.md5(f"{len(self.history)}:{content}".encode('utf-8')).hexdigest()
+        reply = FAKE_REPLIES[int(digest, 16) % len(FAKE_REPLIES)]
+        self.history.append(FakeContent('user', content))
+        self.history.append(FakeContent('model', reply))
+        return FakeResponse(reply)
+
+
+class FakeGenerativeModel:
+    def __init__(self, model_name='fake', system_instruction='', generation_config=None, latency_ms=None):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.generation_config = generation_config or {}
+        self.latency_ms = FAKE_LLM_LATENCY_MS if latency_ms is None else latency_ms
+
+    def start_chat(self, history=None):
+        return FakeChatSession(self, history)
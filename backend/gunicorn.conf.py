@@ -1,9 +1,96 @@
 import multiprocessing
 import os
+import logging
 
 # Gunicorn configuration file
+#
+# Arbetslasten är nästan bara I/O-väntan på Gemini, så standardprofilen är
+# 'gthread' med få processer och många trådar i stället för cpu_count()*2+1
+# processer (varje process laddar hela Gemini-SDK:t och kostar minne).
+#
+# Välj profil med SERVING_PROFILE:
+#   sync     - en request per process (cpu*2+1 processer), endast för felsökning
+#   gthread  - få processer, många trådar (standard)
+#   gevent   - kooperativa greenlets, kräver 'pip install gevent'
+#   eventlet - kooperativa greenlets, kräver 'pip install eventlet'
+#   async    - alias för gevent (Flask är WSGI, så "async" körs via greenlets)
+#
+# Enskilda värden kan skrivas över med GUNICORN_WORKERS, GUNICORN_THREADS,
+# GUNICORN_WORKER_CONNECTIONS, GUNICORN_TIMEOUT, GUNICORN_MAX_REQUESTS,
+# GUNICORN_MAX_REQUESTS_JITTER och GUNICORN_PRELOAD.
+
+logger = logging.getLogger('gunicorn.error')
+
 port = os.environ.get('PORT', '10000')  # Använd PORT från miljövariabeln eller 10000 som standard
 bind = f"0.0.0.0:{port}"  # Bind till alla interfaces på angiven port
-workers = multiprocessing.cpu_count() * 2 + 1
-threads = 2
-timeout = 120  # Ökad timeout för AI-svar
+
+cpu_count = multiprocessing.cpu_count()
+
+SERVING_PROFILES = {
+    'sync': {'worker_class': 'sync', 'workers': cpu_count * 2 + 1, 'threads': 1},
+    'gthread': {'worker_class': 'gthread', 'workers': max(2, cpu_count), 'threads': 32},
+    'gevent': {'worker_class': 'gevent', 'workers': max(2, cpu_count), 'worker_connections': 500},
+    'eventlet': {'worker_class': 'eventlet', 'workers': max(2, cpu_count), 'worker_connections': 500},
+}
+SERVING_PROFILES['async'] = SERVING_PROFILES['gevent']
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _worker_module_available(worker_class):
+    # gevent/eventlet är valfria beroenden, fall tillbaka till gthread om de saknas
+    if worker_class not in ('gevent', 'eventlet'):
+        return True
+    try:
+        __import__(worker_class)
+        return True
+    except ImportError:
+        return False
+
+
+serving_profile = os.environ.get('SERVING_PROFILE', 'gthread').lower()
+if serving_profile not in SERVING_PROFILES:
+    logger.warning(f"Unknown SERVING_PROFILE '{serving_profile}', using 'gthread'.")
+    serving_profile = 'gthread'
+profile = SERVING_PROFILES[serving_profile]
+if not _worker_module_available(profile['worker_class']):
+    logger.warning(f"Worker class '{profile['worker_class']}' not installed, falling back to 'gthread'.")
+    serving_profile = 'gthread'
+    profile = SERVING_PROFILES['gthread']
+
+worker_class = profile['worker_class']
+# WEB_CONCURRENCY är standardvariabeln på t.ex. Render/Heroku
+workers = _env_int('GUNICORN_WORKERS', _env_int('WEB_CONCURRENCY', profile['workers']))
+threads = _env_int('GUNICORN_THREADS', profile.get('threads', 1))
+worker_connections = _env_int('GUNICORN_WORKER_CONNECTIONS', profile.get('worker_connections', 1000))
+# Exporteras så att databaspoolen (storage.default_pool_size) kan dimensioneras efter trådantalet
+os.environ.setdefault('GUNICORN_THREADS', str(threads))
+if worker_class in ('gevent', 'eventlet'):
+    # Greenlets delar på poolen; anropen väntar i kö när den är full
+    os.environ.setdefault('DATABASE_POOL_SIZE', str(min(worker_connections, 20)))
+
+timeout = _env_int('GUNICORN_TIMEOUT', 120)  # Ökad timeout för AI-svar
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+
+# Starta om processer regelbundet för att begränsa minnesläckor. Jitter sprider
+# omstarterna så att inte alla processer startas om samtidigt.
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', max(1, max_requests // 10) if max_requests else 0)
+
+# preload delar importerad kod mellan processer (copy-on-write) och sparar minne.
+# Av som standard för gevent/eventlet, där monkey-patching måste ske före import.
+preload_app = os.environ.get(
+    'GUNICORN_PRELOAD', 'false' if worker_class in ('gevent', 'eventlet') else 'true'
+).lower() in ('true', '1')
+
+
+def when_ready(server):
+    server.log.info(
+        f"Serving profile '{serving_profile}': worker_class={worker_class}, workers={workers}, "
+        f"threads={threads}, worker_connections={worker_connections}, timeout={timeout}, "
+        f"max_requests={max_requests}±{max_requests_jitter}, preload_app={preload_app}"
+    )
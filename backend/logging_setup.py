@@ -0,0 +1,273 @@
+# backend/logging_setup.py
+"""
+Strukturerad loggning för backend.
+
+- configure_logging() ersätter logging.basicConfig och anropas en gång (app.py).
+  Inställningarna (LOG_*) läses från miljön först då, så värden från .env gäller.
+  Loggposter läggs i en kö och skrivs av en bakgrundstråd (QueueListener), så
+  logg-I/O blockerar aldrig en gunicorn-tråd. Är kön full kastas posten och räknas;
+  antalet kastade poster loggas som eventet logging.records_dropped (högst en gång per minut).
+- LOG_FORMAT=json (standard) ger en JSON-rad per post; LOG_FORMAT=text ger läsbar text lokalt.
+- log_event() loggar ett namngivet event med fält. Fälten formateras först i
+  lyssnartråden (lat formatering), långa strängar kortas av, och varje event
+  kan samplas via LOG_SAMPLE_RATES, t.ex. "chat.reply_preview=0.1,parse.json_block=0".
+- Request-id (X-Request-ID eller genererat) sätts per request och följer med
+  i alla poster som loggas under requesten.
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+import uuid
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+import contextvars
+
+# Sätts från miljön av configure_logging()
+LOG_LEVEL = 'INFO'
+LOG_FORMAT = 'json'
+LOG_QUEUE_ENABLED = True
+LOG_QUEUE_SIZE = 10000
+LOG_MAX_FIELD_CHARS = 200
+
+# Minsta tid mellan två rapporter om kastade loggposter
+DROPPED_REPORT_INTERVAL_S = 60.0
+
+request_id_var = contextvars.ContextVar('request_id', default='-')
+
+
+def _parse_sample_rates(raw):
+    rates = {}
+    for item in filter(None, (part.strip() for part in raw.split(','))):
+        name, _, value = item.partition('=')
+        try:
+            rates[name.strip()] = max(0.0, min(1.0, float(value)))
+        except ValueError:
+            continue
+    return rates
+
+
+SAMPLE_RATES = {}
+
+
+def _truncate(value):
+    if isinstance(value, str) and len(value) > LOG_MAX_FIELD_CHARS:
+        return value[:LOG_MAX_FIELD_CHARS] + f"...(+{len(value) - LOG_MAX_FIELD_CHARS})"
+    if isinstance(value, (dict, list, tuple)):
+        return _truncate(json.dumps(value, ensure_ascii=False, default=str))
+    return value
+
+
+def log_event(logger, event, level=logging.INFO, **fields):
+    """
+    Loggar ett strukturerat event.
+
+    Nivåkontroll och sampling sker innan något formateras, så ett avstängt
+    eller bortsamplat event kostar bara ett par jämförelser.
+
+    Args:
+        logger: Modulens logger.
+        event: Eventnamn, t.ex. "chat.reply_received".
+        level: Loggnivå.
+        **fields: Fält som skrivs med i posten (formateras lat).
+    """
+    if not logger.isEnabledFor(level):
+        return
+    rate = SAMPLE_RATES.get(event)
+    if rate is not None and (rate <= 0.0 or random.random() >= rate):
+        return
+    logger.log(level, event, extra={'event': event, 'fields': fields}, stacklevel=2)
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+        }
+        event = getattr(record, 'event', None)
+        if event:
+            entry['event'] = event
+            for key, value in getattr(record, 'fields', {}).items():
+                entry[key] = _truncate(value)
+        else:
+            entry['message'] = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s')
+
+    def formatMessage(self, record):
+        if getattr(record, 'event', None):
+            fields = ' '.join(f"{k}={_truncate(v)!r}" for k, v in getattr(record, 'fields', {}).items())
+            record.message = f"{record.event} {fields}".rstrip()
+        return super().formatMessage(record)
+
+
+class _DrainingQueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Vid avslut får stoppsignalen vänta på plats i en full kö (poster ska inte tappas)
+        self.queue.put(self._sentinel)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler som aldrig blockerar och som startar om lyssnartråden efter fork
+    (gunicorn med preload_app startar workers via fork, och trådar följer inte med).
+    """
+
+    _exception_formatter = logging.Formatter()
+
+    def __init__(self, log_queue, target_handlers):
+        super().__init__(log_queue)
+        self.target_handlers = target_handlers
+        self.queue_size = log_queue.maxsize
+        self.dropped = 0
+        self._reported_dropped = 0
+        self._last_dropped_report = time.monotonic()
+        self._listener = None
+        self._listener_pid = None
+
+    def start_listener(self):
+        self._listener = _DrainingQueueListener(self.queue, *self.target_handlers, respect_handler_level=True)
+        self._listener.start()
+        self._listener_pid = os.getpid()
+
+    def restart_after_fork(self):
+        # Kön kan ha ärvt ett låst tillstånd från förälderns lyssnartråd, så skapa en ny
+        self.queue = queue.Queue(maxsize=self.queue_size)
+        self.dropped = 0
+        self._reported_dropped = 0
+        self.start_listener()
+
+    def stop_listener(self):
+        if self._listener is not None and self._listener_pid == os.getpid():
+            self._report_dropped()
+            self._listener.stop()
+            self._listener_pid = None
+
+    def prepare(self, record):
+        # Standardimplementationen formaterar hela posten i anropande tråd; fälten formateras
+        # i lyssnaren i stället. Traceback och args löses dock upp här, så att posten inte
+        # håller ramar och lokala variabler vid liv medan den ligger i kön.
+        if not record.exc_info and not record.args:
+            return record
+        record = copy.copy(record)
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self._exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.dropped != self._reported_dropped and \
+                time.monotonic() - self._last_dropped_report >= DROPPED_REPORT_INTERVAL_S:
+            self._report_dropped()
+
+    def _report_dropped(self):
+        dropped = self.dropped
+        if dropped == self._reported_dropped:
+            return
+        record = logging.makeLogRecord({
+            'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+            'msg': 'logging.records_dropped', 'event': 'logging.records_dropped', 'request_id': '-',
+            'fields': {'dropped': dropped - self._reported_dropped, 'dropped_total': dropped,
+                       'queue_size': self.queue_size},
+        })
+        self._last_dropped_report = time.monotonic()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            return  # Rapporteras nästa gång det finns plats
+        self._reported_dropped = dropped
+
+
+_configured = False
+
+
+def configure_logging():
+    """
+    Läser LOG_* från miljön och konfigurerar rotloggern en gång per process.
+    Upprepade anrop gör inget. Anropas efter load_dotenv().
+    """
+    global _configured, LOG_LEVEL, LOG_FORMAT, LOG_QUEUE_ENABLED, LOG_QUEUE_SIZE, LOG_MAX_FIELD_CHARS
+    if _configured:
+        return
+    _configured = True
+
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').lower()
+    LOG_QUEUE_ENABLED = os.getenv('LOG_QUEUE', 'true').lower() in ('true', '1')
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+    LOG_MAX_FIELD_CHARS = int(os.getenv('LOG_MAX_FIELD_CHARS', '200'))
+    # Uppdateras på plats så att moduler som redan importerat SAMPLE_RATES ser värdena
+    SAMPLE_RATES.clear()
+    SAMPLE_RATES.update(_parse_sample_rates(os.getenv('LOG_SAMPLE_RATES', '')))
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(TextFormatter() if LOG_FORMAT == 'text' else JsonFormatter())
+
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    if LOG_QUEUE_ENABLED:
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE), [stream_handler])
+        handler.start_listener()
+        os.register_at_fork(after_in_child=handler.restart_after_fork)
+        atexit.register(handler.stop_listener)
+    else:
+        handler = stream_handler
+    # Filtret körs i anropande tråd så att request-id från contextvars följer med
+    handler.addFilter(RequestIdFilter())
+    root.addHandler(handler)
+
+
+def init_request_ids(app):
+    """Sätter ett request-id per request och returnerar det i X-Request-ID."""
+    from flask import request, g
+
+    @app.before_request
+    def _assign_request_id():
+        incoming = request.headers.get('X-Request-ID', '')
+        request_id = incoming[:64] if incoming else uuid.uuid4().hex[:16]
+        g.request_id_token = request_id_var.set(request_id)
+
+    @app.after_request
+    def _return_request_id(response):
+        response.headers['X-Request-ID'] = request_id_var.get()
+        return response
+
+    @app.teardown_request
+    def _reset_request_id(exc):
+        token = g.pop('request_id_token', None)
+        if token is not None:
+            request_id_var.reset(token)
@@ -3,6 +3,8 @@ import json
 import re
 import logging
 
+from logging_setup import log_event
+
 logger = logging.getLogger(__name__)
 
 # Förbättrad regex för att fånga JSON inuti ```json ... ``` block
@@ -22,19 +24,26 @@ INTERACTIVE_KEYS = {
     # Lägg till fler nycklar här om AI:n kan generera andra typer
 }
 
-def parse_ai_response(raw_text: str) -> dict:
+def _no_log(*args, **kwargs):
+    pass
+
+
+def parse_ai_response(raw_text: str, emit_logs: bool = True) -> dict:
     """
     Parar AI:ns råa textsvar för att extrahera textinnehåll och eventuella
     interaktiva JSON-element.
 
     Args:
         raw_text: Det råa svaret från AI (Gemini).
+        emit_logs: False när redan loggade svar parsas om (resume, replay),
+            så att parse.*-event inte loggas en gång per sparat meddelande.
 
     Returns:
         En dictionary: {"textContent": str, "interactiveJson": dict | None}
         där interactiveJson är det fullständiga parsade JSON-objektet om det
         innehåller en känd interaktiv nyckel, annars None.
     """
+    _log = log_event if emit_logs else _no_log
     text_content = raw_text
     interactive_json_data = None
     json_parsing_successful = False
@@ -45,7 +54,6 @@ def parse_ai_response(raw_text: str) -> dict:
         json_string = match.group(1).strip()
         # Ta bort JSON-blocket (och omgivande ```json```) från texten
         text_content = JSON_BLOCK_REGEX.sub("", raw_text).strip()
-        logger.info(f"Found potential JSON block. Raw string: '{json_string[:100]}...'")
         try:
             # Försök parsa JSON
             parsed_data = json.loads(json_string)
@@ -56,20 +64,20 @@ def parse_ai_response(raw_text: str) -> dict:
                 for key in INTERACTIVE_KEYS:
                     if key in parsed_data:
                         is_interactive = True
-                        logger.info(f"Recognized interactive key '{key}' in JSON.")
+                        _log(logger, "parse.json_block", source="fenced_block", key=key)
                         break # Found an interactive key, no need to check further
 
             if is_interactive:
                 interactive_json_data = parsed_data # Behåll hela det ursprungliga JSON-objektet
                 json_parsing_successful = True
-                logger.info(f"Successfully parsed interactive JSON block.")
             else:
-                 logger.warning(f"Parsed JSON block but did not recognize key as interactive: {parsed_data}")
+                 _log(logger, "parse.json_not_interactive", logging.WARNING, source="fenced_block",
+                           keys=list(parsed_data.keys()) if isinstance(parsed_data, dict) else type(parsed_data).__name__)
                  # Lägg tillbaka JSON som text om det inte var interaktivt? Nej, behåll texten utanför.
                  # text_content = raw_text # Återställ till originaltext om JSON inte var interaktiv? Nej.
 
         except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON block: {e}. Raw block: '{json_string[:100]}...'")
+            _log(logger, "parse.json_error", logging.ERROR, error=str(e), raw_block=json_string)
             # JSON hittades men kunde inte parsas, behåll den som text i svaret.
             text_content = raw_text # Återställ texten till originalet om parse misslyckades
 
@@ -88,7 +96,7 @@ def parse_ai_response(raw_text: str) -> dict:
                  for key in INTERACTIVE_KEYS:
                      if key in parsed_data:
                          is_interactive = True
-                         logger.info(f"Recognized interactive key '{key}' in raw text JSON.")
+                         _log(logger, "parse.json_block", source="raw_text", key=key)
                          break
 
             if is_interactive:
@@ -105,9 +113,9 @@ def parse_ai_response(raw_text: str) -> dict:
                     elif 'description' in parsed_data and isinstance(parsed_data['description'], str):
                          extracted_text = parsed_data['description']
                 text_content = extracted_text # Ersätt text_content med text från JSON
-                logger.info(f"Successfully parsed raw text as interactive JSON. Using extracted text: '{text_content[:50]}...'")
             else:
-                 logger.warning(f"Parsed raw text as JSON but did not recognize key as interactive: {parsed_data}")
+                 _log(logger, "parse.json_not_interactive", logging.WARNING, source="raw_text",
+                           keys=list(parsed_data.keys()) if isinstance(parsed_data, dict) else type(parsed_data).__name__)
                  # Behandla det inte som interaktivt, text_content är redan raw_text.
 
          except json.JSONDecodeError:
@@ -126,7 +134,6 @@ def parse_ai_response(raw_text: str) -> dict:
             extracted_text = interactive_json_data['description'] # För scenarier
         if extracted_text:
             text_content = extracted_text
-            logger.info(f"JSON found, outer text empty. Using extracted JSON text as textContent: '{text_content[:50]}...'")
 
 
     # Säkerställ att text_content alltid är en sträng
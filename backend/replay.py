@@ -0,0 +1,284 @@
+# backend/replay.py
+"""
+Batch-utvärdering: spelar upp inspelade transkript genom hela chat()-pipelinen.
+
+Varje konversation körs mot /api/v2/chat via Flasks testklient (med egen
+cookie-session) på samma sätt som frontend: första "start" öppnar konversationen,
+därefter skickas varje meddelande med conversationId och nästa seq. Ett "start"
+mitt i konversationen går alltså till modellen, precis som i produktion. Samma
+kod som i produktion används: sessionshantering, prompt-bygge, kursplanindex,
+parse_ai_response och svarsformatet. Saknar transkriptet inledande "start"
+öppnas konversationen ändå (utan att räknas som tur). Som standard
+används den fejkade LLM:en (LLM_PROVIDER=fake); --provider gemini kör mot
+riktiga API:t.
+
+Transkriptformat (JSONL, en konversation per rad):
+    {"id": "k1", "name": "Anna", "answers": {"underskoterska": "ja", "delegering": "nej"},
+     "messages": ["start", "Jag är redo", "ja"]}
+
+Exempel:
+    python replay.py transcripts.jsonl --workers 32 --output run.json
+    python replay.py transcripts.jsonl --baseline run.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# Tecken per token vid uppskattning när providern inte rapporterar usage
+CHARS_PER_TOKEN = 4
+
+_app = None
+_metrics = threading.local()
+
+
+def _estimate_tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN) if text else 0
+
+
+class RecordingChatSession:
+    """Omsluter en chattsession och registrerar råsvar och tokenanvändning för aktuell tur."""
+
+    def __init__(self, inner, system_instruction):
+        self._inner = inner
+        self._system_instruction = system_instruction
+
+    @property
+    def history(self):
+        return self._inner.history
+
+    def send_message(self, content):
+        response = self._inner.send_message(content=content)
+        raw_text = getattr(response, 'text', '') or ''
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None and getattr(usage, 'prompt_token_count', None):
+            prompt_tokens = usage.prompt_token_count
+            output_tokens = getattr(usage, 'candidates_token_count', 0) or 0
+            estimated = False
+        else:
+            history_text = "".join(
+                part.text for turn in self._inner.history for part in getattr(turn, 'parts', [])
+                if getattr(part, 'text', None)
+            )
+            prompt_tokens = _estimate_tokens(self._system_instruction) + _estimate_tokens(history_text)
+            output_tokens = _estimate_tokens(raw_text)
+            estimated = True
+        _metrics.turn = {
+            "raw_reply": raw_text,
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "estimated_tokens": estimated,
+        }
+        return response
+
+
+class RecordingModel:
+    def __init__(self, inner, system_instruction):
+        self._inner = inner
+        self._system_instruction = system_instruction
+
+    def start_chat(self, history=None):
+        return RecordingChatSession(self._inner.start_chat(history=history), self._system_instruction)
+
+
+def _build_app():
+    from flask import Flask
+    import ai
+
+    original_get_model = ai.get_gemini_model
+
+    def recording_get_model(user_answers, current_module=0):
+        model = original_get_model(user_answers, current_module)
+        return RecordingModel(model, ai.build_system_instruction(user_answers, current_module))
+
+    ai.get_gemini_model = recording_get_model
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'replay-only'
+    app.config['SESSION_COOKIE_SECURE'] = False
+    app.register_blueprint(ai.ai_bp)
+    return app
+
+
+def _get_app():
+    global _app
+    if _app is None:
+        _app = _build_app()
+    return _app
+
+
+def replay_conversation(conversation):
+    """
+    Spelar upp en konversation och returnerar mätvärden per tur.
+
+    Returns:
+        {"id": str, "turns": [dict], "error": str | None}
+    """
+    from parsing_utils import parse_ai_response, JSON_BLOCK_REGEX
+
+    app = _get_app()
+    client = app.test_client()
+    result = {"id": conversation.get("id"), "turns": [], "error": None}
+    start_payload = {"message": "start", "name": conversation.get("name", "Användare"),
+                     "answers": conversation.get("answers", {})}
+    messages = list(conversation.get("messages", []))
+    conversation_id, seq = None, 0
+    if not messages or messages[0].strip().lower() != "start":
+        # Frontend skickar alltid "start" först; gör likadant även om det inte spelades in
+        opening = client.post('/api/v2/chat', json=start_payload)
+        if opening.status_code != 200:
+            result["error"] = f"start failed with HTTP {opening.status_code}"
+            return result
+        conversation_id, seq = opening.get_json()["conversationId"], opening.get_json()["seq"]
+
+    for message in messages:
+        _metrics.turn = None
+        if conversation_id is None:
+            payload = start_payload
+        else:
+            payload = {"conversationId": conversation_id, "seq": seq + 1, "message": message}
+        started = time.perf_counter()
+        try:
+            response = client.post('/api/v2/chat', json=payload)
+            status = response.status_code
+            body = response.get_json(silent=True) or {}
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+            break
+        latency_ms = (time.perf_counter() - started) * 1000
+        if status == 200:
+            # Som klienten: följ alltid serverns conversationId och seq
+            conversation_id, seq = body["conversationId"], body["seq"]
+        reply = body.get("reply") or {}
+        interactive = reply.get("interactiveElement")
+        turn = {
+            "message": message,
+            "status": status,
+            "latency_ms": latency_ms,
+            "interactive_type": interactive.get("type") if isinstance(interactive, dict) else None,
+            "model_called": _metrics.turn is not None,
+        }
+        if _metrics.turn is not None:
+            raw = _metrics.turn.pop("raw_reply")
+            has_json = bool(JSON_BLOCK_REGEX.search(raw)) or raw.strip().startswith(("{", "```"))
+            turn.update(_metrics.turn)
+            turn["json_attempted"] = has_json
+            turn["json_parsed"] = has_json and parse_ai_response(raw, emit_logs=False)["interactiveJson"] is not None
+        result["turns"].append(turn)
+    return result
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(results):
+    turns = [t for r in results for t in r["turns"]]
+    model_turns = [t for t in turns if t.get("model_called")]
+    json_turns = [t for t in model_turns if t.get("json_attempted")]
+    type_counts = Counter(t["interactive_type"] or "text" for t in model_turns)
+    latencies = [t["latency_ms"] for t in model_turns]
+    summary = {
+        "conversations": len(results),
+        "conversation_errors": sum(1 for r in results if r["error"]),
+        "turns": len(turns),
+        "model_turns": len(model_turns),
+        "http_errors": sum(1 for t in turns if t["status"] >= 400),
+        "prompt_tokens_per_turn": statistics.mean(t["prompt_tokens"] for t in model_turns) if model_turns else 0.0,
+        "output_tokens_per_turn": statistics.mean(t["output_tokens"] for t in model_turns) if model_turns else 0.0,
+        "tokens_estimated": any(t.get("estimated_tokens") for t in model_turns),
+        "latency_p50_ms": _percentile(latencies, 0.5),
+        "latency_p95_ms": _percentile(latencies, 0.95),
+        "parse_success_rate": (sum(1 for t in json_turns if t["json_parsed"]) / len(json_turns)) if json_turns else 1.0,
+        "interactive_distribution": {
+            key: count / len(model_turns) for key, count in sorted(type_counts.items())
+        } if model_turns else {},
+    }
+    return summary
+
+
+def diff_against_baseline(summary, baseline):
+    lines = []
+    for key, value in summary.items():
+        base = baseline.get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and isinstance(base, (int, float)):
+            change = value - base
+            relative = f" ({change / base:+.1%})" if base else ""
+            lines.append(f"  {key:<24} {base:>12.3f} -> {value:>12.3f}  {change:+.3f}{relative}")
+        elif key == "interactive_distribution" and isinstance(base, dict):
+            for kind in sorted(set(value) | set(base)):
+                old, new = base.get(kind, 0.0), value.get(kind, 0.0)
+                lines.append(f"  {'type:' + kind:<24} {old:>12.1%} -> {new:>12.1%}  {new - old:+.1%}")
+        elif base != value:
+            lines.append(f"  {key:<24} {base!r} -> {value!r}")
+    return "\n".join(lines)
+
+
+def load_transcripts(path):
+    conversations = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            conversation = json.loads(line)
+            conversation.setdefault("id", str(line_number))
+            conversations.append(conversation)
+    return conversations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded transcripts through the chat pipeline.")
+    parser.add_argument("transcripts", help="JSONL-fil med konversationer")
+    parser.add_argument("--provider", choices=["fake", "gemini"], default="fake")
+    parser.add_argument("--fake-latency-ms", type=float, default=0.0, help="Simulerad latens för fejk-LLM:en")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread",
+                        help="thread räcker när providern är I/O-bunden; process för CPU-tunga körningar")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--output", help="Skriv sammanfattning och resultat per konversation som JSON")
+    parser.add_argument("--baseline", help="Tidigare --output att jämföra mot")
+    args = parser.parse_args()
+
+    # Miljön måste sättas innan ai/fake_llm importeras (läses vid import)
+    os.environ["LLM_PROVIDER"] = args.provider
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.fake_latency_ms)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    conversations = load_transcripts(args.transcripts)
+    executor_cls = ThreadPoolExecutor if args.executor == "thread" else ProcessPoolExecutor
+    if args.executor == "thread":
+        _get_app()  # Bygg appen en gång innan trådarna startar
+
+    started = time.perf_counter()
+    with executor_cls(max_workers=args.workers) as pool:
+        results = list(pool.map(replay_conversation, conversations))
+    wall_time = time.perf_counter() - started
+
+    import ai
+    summary = summarize(results)
+    summary["prompt_hash"] = ai.get_prompt_hash()
+    summary["provider"] = args.provider
+    summary["wall_time_s"] = wall_time
+
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("summary", {})
+        print("\nDiff mot baseline:")
+        print(diff_against_baseline(summary, baseline) or "  (inga skillnader)")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "conversations": results}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
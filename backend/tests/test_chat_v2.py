@@ -0,0 +1,140 @@
+import os
+import gzip
+import json
+
+import pytest
+
+# Måste sättas innan ai importeras (läses vid import)
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("FAKE_LLM_LATENCY_MS", "0")
+os.environ.setdefault("DATABASE_URL", "memory://")
+
+flask = pytest.importorskip("flask")
+ai = pytest.importorskip("ai")
+import fake_llm  # noqa: E402
+
+ANSWERS = {"underskoterska": "ja", "delegering": "nej"}
+
+
+@pytest.fixture
+def model_calls(monkeypatch):
+    calls = []
+    original = fake_llm.FakeChatSession.send_message
+
+    def counting_send_message(self, content):
+        calls.append(content)
+        return original(self, content)
+
+    monkeypatch.setattr(fake_llm.FakeChatSession, "send_message", counting_send_message)
+    return calls
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(ai, "LLM_PROVIDER", "fake")
+    app = flask.Flask(__name__)
+    app.config["SECRET_KEY"] = "test"
+    app.register_blueprint(ai.ai_bp)
+    return app.test_client()
+
+
+def _start(client):
+    response = client.post("/api/v2/chat", json={"message": "start", "name": "Anna", "answers": ANSWERS})
+    assert response.status_code == 200
+    return response.get_json()["conversationId"]
+
+
+def _turn(client, conversation_id, seq, message):
+    return client.post("/api/v2/chat", json={"conversationId": conversation_id, "seq": seq, "message": message})
+
+
+def test_duplicate_seq_returns_stored_reply_without_model_call(client, model_calls):
+    conversation_id = _start(client)
+    first = _turn(client, conversation_id, 1, "Jag är redo")
+    assert first.status_code == 200 and len(model_calls) == 1
+
+    retry = _turn(client, conversation_id, 1, "Jag är redo")
+    assert retry.status_code == 200
+    assert retry.get_json() == first.get_json()
+    assert len(model_calls) == 1
+
+
+def test_reused_seq_with_other_message_is_seq_conflict(client, model_calls):
+    conversation_id = _start(client)
+    assert _turn(client, conversation_id, 1, "Jag är redo").status_code == 200
+
+    response = _turn(client, conversation_id, 1, "Något helt annat")
+    assert response.status_code == 409
+    assert response.get_json()["code"] == "seq_conflict"
+    assert len(model_calls) == 1
+
+
+@pytest.mark.parametrize("seq", [0, 3])
+def test_stale_or_skipped_seq_is_bad_seq(client, model_calls, seq):
+    conversation_id = _start(client)
+    assert _turn(client, conversation_id, 1, "Jag är redo").status_code == 200
+
+    response = _turn(client, conversation_id, seq, "Nästa svar")
+    assert response.status_code == 409
+    assert response.get_json()["code"] == "bad_seq"
+    assert response.get_json()["expectedSeq"] == 2
+    assert len(model_calls) == 1
+
+
+def test_unknown_conversation(client, model_calls):
+    _start(client)
+    response = _turn(client, "okand", 1, "Hej")
+    assert response.status_code == 409
+    assert response.get_json()["code"] == "unknown_conversation"
+    assert model_calls == []
+
+
+def test_start_mid_conversation_is_sent_to_model(client, model_calls):
+    conversation_id = _start(client)
+    response = _turn(client, conversation_id, 1, "start")
+    assert response.status_code == 200
+    assert response.get_json()["conversationId"] == conversation_id
+    assert model_calls == ["start"]
+
+    # Konversationen lever vidare med samma id, namn och bakgrundssvar
+    assert _turn(client, conversation_id, 2, "ja").status_code == 200
+    with client.session_transaction() as stored:
+        context = stored["chat_context"]
+    assert context["user_name"] == "Anna" and context["user_answers"] == ANSWERS
+    assert context["seq"] == 2 and len(context["history"]) == 5
+
+
+@pytest.mark.parametrize("body", [
+    {"message": 5},
+    {"message": ["start"]},
+    {"message": "Hej", "conversationId": "abc", "seq": "1"},
+    {"message": "Hej", "conversationId": "abc", "seq": True},
+    {"message": "Hej", "conversationId": 7, "seq": 1},
+    ["start"],
+])
+def test_invalid_payload_is_400(client, model_calls, body):
+    response = client.post("/api/v2/chat", data=json.dumps(body), content_type="application/json")
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+    assert model_calls == []
+
+
+def test_compression_threshold_and_accept_encoding(client, monkeypatch):
+    monkeypatch.setattr(ai, "COMPRESSION_ENABLED", True)
+    monkeypatch.setattr(ai, "brotli", None)
+    start_body = {"message": "start", "name": "Anna", "answers": ANSWERS}
+
+    monkeypatch.setattr(ai, "COMPRESSION_MIN_BYTES", 10)
+    compressed = client.post("/api/v2/chat", json=start_body, headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.headers["Vary"]
+    payload = json.loads(gzip.decompress(compressed.get_data()))
+    assert payload["seq"] == 0
+
+    plain = client.post("/api/v2/chat", json=start_body)
+    assert "Content-Encoding" not in plain.headers
+
+    monkeypatch.setattr(ai, "COMPRESSION_MIN_BYTES", 10 ** 6)
+    small = client.post("/api/v2/chat", json=start_body, headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers
+    assert small.get_json()["seq"] == 0
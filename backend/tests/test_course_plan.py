@@ -0,0 +1,53 @@
+import pytest
+
+from course_plan import load_course_plan, parse_course_plan
+
+
+@pytest.fixture(scope="module")
+def plan():
+    return load_course_plan()
+
+
+def test_parses_all_modules_with_sections(plan):
+    assert len(plan) == 19
+    assert plan.modules[6]["title"] == "Vanliga läkemedelsgrupper"
+    assert "Inhalation" in plan.modules[8]["sections"]
+
+
+def test_full_heading_reference_switches_module(plan):
+    assert plan.detect_module("Nu går vi vidare till 7. Vanliga läkemedelsgrupper", 2) == 6
+    assert plan.detect_module("**19. Kommunikation med hjälp av SBAR**\nSBAR står för...", 10) == 18
+
+
+def test_numbered_list_does_not_count_as_heading(plan):
+    reply = "Så här gör du:\n1. Kontrollera patientens identitet och bakgrund\n2. Regler finns."
+    assert plan.detect_module(reply, 6) == 6
+    assert plan.detect_module("2. Regler finns.", 6) == 6
+
+
+def test_keyword_fallback_does_not_jump_past_next_module(plan):
+    reply = ("Tvätta händerna noga med tvål och vatten och använd handsprit innan du börjar. "
+             "Kontrollera sedan att du har rätt patient och rätt läkemedel, och kontrollera "
+             "ordinationshandlingen innan du ger något.")
+    assert plan.detect_module(reply, 5) in (5, 6)
+
+
+def test_keyword_fallback_advances_to_next_module(plan):
+    reply = "SBAR: situation, bakgrund, aktuellt tillstånd och rekommendation."
+    assert plan.detect_module(reply, 17) == 18
+    assert plan.detect_module(reply, 2) == 2
+
+
+def test_render_context_includes_neighbours_and_current_sections(plan):
+    context = plan.render_context(8)
+    assert "8. Viktiga överväganden vid läkemedelsordination" in context
+    assert "10. Hantering av receptfria läkemedel och naturläkemedel\n" in context
+    assert "   - Oral administrering" in context
+    assert plan.render_module(2) not in context
+
+
+def test_empty_plan_is_safe():
+    empty = parse_course_plan("")
+    assert len(empty) == 0
+    assert empty.detect_module("7. Vanliga läkemedelsgrupper", 3) == 0
+    assert empty.render_context(0) == ""
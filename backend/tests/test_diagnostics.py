@@ -0,0 +1,54 @@
+import tracemalloc
+
+import pytest
+
+flask = pytest.importorskip("flask")
+import diagnostics  # noqa: E402
+from diagnostics import trace_hot_path, init_diagnostics  # noqa: E402
+
+
+def _sample(x):
+    return x * 2
+
+
+def test_trace_hot_path_is_noop_when_disabled(monkeypatch):
+    monkeypatch.delenv("DIAGNOSTICS_ENABLED", raising=False)
+    assert trace_hot_path()(_sample) is _sample
+
+
+def test_trace_hot_path_counts_calls_when_enabled(monkeypatch):
+    monkeypatch.setenv("DIAGNOSTICS_ENABLED", "true")
+    monkeypatch.setattr(diagnostics, "_hot_path_stats", {})
+    traced = trace_hot_path("sample")(_sample)
+    assert traced is not _sample
+    assert traced(3) == 6 and traced(4) == 8
+    assert diagnostics._hot_path_stats["sample"]["count"] == 2
+
+
+@pytest.fixture
+def diagnostics_client(monkeypatch):
+    monkeypatch.setenv("DIAGNOSTICS_ENABLED", "true")
+    monkeypatch.setenv("DIAGNOSTICS_TOKEN", "hemligt")
+    monkeypatch.setenv("DIAGNOSTICS_SAMPLING_INTERVAL_MS", "0")
+    # init_diagnostics skriver över modulens inställningar; återställs av monkeypatch
+    for name in ("DIAGNOSTICS_ENABLED", "DIAGNOSTICS_TOKEN", "SNAPSHOT_EVERY",
+                 "TRACEMALLOC_FRAMES", "SAMPLING_INTERVAL_MS", "TOP_N"):
+        monkeypatch.setattr(diagnostics, name, getattr(diagnostics, name))
+    was_tracing = tracemalloc.is_tracing()
+    app = flask.Flask(__name__)
+    init_diagnostics(app)
+    yield app.test_client()
+    if not was_tracing:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Debug-Token": "fel"}])
+def test_debug_profile_requires_token(diagnostics_client, headers):
+    response = diagnostics_client.get("/debug/profile", headers=headers)
+    assert response.status_code == 403
+
+
+def test_debug_profile_with_token(diagnostics_client):
+    response = diagnostics_client.get("/debug/profile", headers={"X-Debug-Token": "hemligt"})
+    assert response.status_code == 200
+    assert "hot_paths" in response.get_json()
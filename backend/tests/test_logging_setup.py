@@ -0,0 +1,54 @@
+import io
+import json
+import queue
+import logging
+
+import logging_setup
+from logging_setup import JsonFormatter, NonBlockingQueueHandler, RequestIdFilter
+
+
+def _queue_logger(name, maxsize):
+    output = io.StringIO()
+    stream_handler = logging.StreamHandler(output)
+    stream_handler.setFormatter(JsonFormatter())
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=maxsize), [stream_handler])
+    handler.addFilter(RequestIdFilter())
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    return logger, handler, output
+
+
+def test_prepare_drops_exc_info_and_args():
+    logger, handler, output = _queue_logger("test.prepare", 10)
+    try:
+        raise ValueError("fel")
+    except ValueError:
+        logger.exception("Misslyckades för %s", "Anna")
+
+    queued = handler.queue.get_nowait()
+    assert queued.exc_info is None and queued.args is None
+    assert queued.getMessage() == "Misslyckades för Anna"
+    assert "ValueError: fel" in queued.exc_text
+
+    entry = json.loads(JsonFormatter().format(queued))
+    assert "ValueError: fel" in entry["exc_info"]
+    logger.removeHandler(handler)
+
+
+def test_dropped_records_are_reported(monkeypatch):
+    monkeypatch.setattr(logging_setup, "DROPPED_REPORT_INTERVAL_S", 0)
+    logger, handler, output = _queue_logger("test.dropped", 2)
+    for i in range(5):
+        logger.info("post %d", i)
+    assert handler.dropped == 3
+
+    handler.start_listener()
+    logger.info("efter")
+    handler.stop_listener()
+    logger.removeHandler(handler)
+
+    events = [json.loads(line) for line in output.getvalue().splitlines()]
+    reports = [e for e in events if e.get("event") == "logging.records_dropped"]
+    assert reports and reports[0]["dropped"] == 3 and reports[0]["dropped_total"] == 3
@@ -0,0 +1,21 @@
+import logging
+
+from parsing_utils import parse_ai_response
+
+REPLY = 'Vad vill du göra?\n```json\n{"suggestions": ["Fortsätt", "Repetera"]}\n```'
+
+
+def test_parses_interactive_block(caplog):
+    with caplog.at_level(logging.INFO, logger="parsing_utils"):
+        parsed = parse_ai_response(REPLY)
+    assert parsed["textContent"] == "Vad vill du göra?"
+    assert parsed["interactiveJson"] == {"suggestions": ["Fortsätt", "Repetera"]}
+    assert [r.event for r in caplog.records] == ["parse.json_block"]
+
+
+def test_emit_logs_false_is_silent(caplog):
+    with caplog.at_level(logging.INFO, logger="parsing_utils"):
+        parsed = parse_ai_response(REPLY, emit_logs=False)
+        parse_ai_response("```json\n{trasig}\n```", emit_logs=False)
+    assert parsed["interactiveJson"] is not None
+    assert caplog.records == []
@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("FAKE_LLM_LATENCY_MS", "0")
+os.environ.setdefault("DATABASE_URL", "memory://")
+
+pytest.importorskip("flask")
+ai = pytest.importorskip("ai")
+import replay  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fake_provider(monkeypatch):
+    monkeypatch.setattr(ai, "LLM_PROVIDER", "fake")
+    monkeypatch.setattr(ai, "get_gemini_model", ai.get_gemini_model)  # replay ersätter den
+    monkeypatch.setattr(replay, "_app", None)
+
+
+def test_replay_drives_v2_like_the_client():
+    result = replay.replay_conversation(
+        {"id": "k1", "name": "Anna", "answers": {"underskoterska": "ja"}, "messages": ["start", "start", "ja"]})
+    assert result["error"] is None
+    assert [t["status"] for t in result["turns"]] == [200, 200, 200]
+    # Bara det första "start" öppnar konversationen; elevens "start" går till modellen
+    assert [t["model_called"] for t in result["turns"]] == [False, True, True]
+
+
+def test_replay_opens_conversation_without_recorded_start():
+    result = replay.replay_conversation({"id": "k2", "messages": ["Jag är redo", "ja"]})
+    assert result["error"] is None
+    assert [t["model_called"] for t in result["turns"]] == [True, True]
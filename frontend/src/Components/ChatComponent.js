@@ -683,6 +683,59 @@ const AnimatedInteractiveItem = ({ children, index = 0, isVisible, animationPhas
 
 // --- Main Chat Component ---
 
+// How long to keep polling a turn the server is still generating. Matches the
+// server's in-flight lock TTL (INFLIGHT_LOCK_SECONDS in backend/ai.py) plus a margin.
+const IN_PROGRESS_MAX_WAIT_MS = 135000;
+
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+// Generate unique ID for messages
+const generateId = () => `${Date.now()}-${Math.random().toString(36).substring(2, 9)}`;
+
+// Post a chat turn. Retries reuse the same seq, so the server returns the stored
+// reply instead of generating (and paying for) a second answer.
+const postChatTurn = async (payload, retries = 2) => {
+  const startedAt = Date.now();
+  let failedAttempts = 0;
+  for (;;) {
+    try {
+      return await axios.post(API_ENDPOINTS.CHAT_V2, payload);
+    } catch (error) {
+      const status = error?.response?.status;
+      if (status === 409 && error.response.data?.code === 'in_progress') {
+        // The server is still generating this turn: poll (without using up retries)
+        // until its lock would have expired, then the stored reply is returned
+        if (Date.now() - startedAt >= IN_PROGRESS_MAX_WAIT_MS) throw error;
+        const retryAfterSeconds = Number(error.response.headers?.['retry-after']) || 2;
+        await sleep(retryAfterSeconds * 1000);
+        continue;
+      }
+      const retryable = !error.response || status === 502 || status === 503;
+      if (!retryable || failedAttempts >= retries) throw error;
+      failedAttempts += 1;
+      await sleep(1000 * failedAttempts);
+    }
+  }
+};
+
+// Fetch the stored transcript (all pages, newest first) after a page reload.
+// Returns null when there is nothing to resume and a new chat must be started.
+const fetchResumedChat = async () => {
+  const messages = [];
+  let before = null;
+  let resumeInfo = null;
+  do {
+    const params = { limit: 200 };
+    if (before !== null) params.before = before;
+    const response = await axios.get(API_ENDPOINTS.CHAT_RESUME, { params });
+    if (!response.data?.resumable) return null;
+    resumeInfo = resumeInfo || response.data;
+    messages.unshift(...response.data.messages);
+    before = response.data.nextBefore;
+  } while (before !== null && before !== undefined);
+  return { ...resumeInfo, messages };
+};
+
 const ChatComponent = () => {
   const [messages, setMessages] = useState([]);
   const [userInput, setUserInput] = useState('');
@@ -695,6 +748,8 @@ const ChatComponent = () => {
   const navigate = useNavigate();
   const chatContainerRef = useRef(null);
   const startChatCalledRef = useRef(false); // To prevent multiple start calls
+  const conversationIdRef = useRef(null); // Server-assigned conversation id (v2 API)
+  const seqRef = useRef(0); // Sequence number of the last acknowledged turn
 
   // Retrieve user info from localStorage
   const userName = localStorage.getItem('userName') || 'Användare';
@@ -747,8 +802,43 @@ const ChatComponent = () => {
     return () => window.removeEventListener('resize', setVhProperty);
   }, []);
 
-  // Generate unique ID for messages
-  const generateId = () => `${Date.now()}-${Math.random().toString(36).substring(2, 9)}`;
+  // Replace the local transcript with the one stored on the server and adopt its
+  // conversation id and seq. Extra messages (e.g. an unsent user message) are appended.
+  const restoreTranscript = useCallback((resumed, extraMessages = []) => {
+    conversationIdRef.current = resumed.conversationId;
+    seqRef.current = resumed.seq;
+    const restored = resumed.messages.map(msg => ({
+      id: generateId(),
+      sender: msg.sender,
+      textContent: msg.textContent || "",
+      interactiveElement: msg.interactiveElement
+    }));
+    setMessages([...restored, ...extraMessages]);
+    return restored.length > 0 ? restored[restored.length - 1].id : null;
+  }, []);
+
+  // Start a new conversation on the server and show its greeting
+  const startNewConversation = useCallback(async () => {
+    const response = await postChatTurn({
+      answers: { underskoterska, delegering },
+      message: "start", // Special message to initiate
+      name: userName
+    });
+
+    conversationIdRef.current = response.data.conversationId;
+    seqRef.current = response.data.seq;
+    const { textContent, interactiveElement } = response.data.reply;
+    const msgId = generateId();
+    setLatestMessageId(msgId);
+
+    setMessages([{
+      id: msgId,
+      sender: 'assistant',
+      textContent: textContent || "", // Ensure textContent is always a string
+      interactiveElement: interactiveElement // Store parsed element directly
+    }]);
+    // setTextCompletion will be set by SmoothTextDisplay
+  }, [underskoterska, delegering, userName]);
 
   // Start chat function (called on mount if no messages)
   const startChat = useCallback(async () => {
@@ -761,23 +851,20 @@ const ChatComponent = () => {
     setLatestMessageId(null); // Reset latest ID
 
     try {
-      const response = await axios.post(API_ENDPOINTS.CHAT, {
-        answers: { underskoterska, delegering },
-        message: "start", // Special message to initiate
-        name: userName
-      });
-
-      const { textContent, interactiveElement } = response.data.reply;
-      const msgId = generateId();
-      setLatestMessageId(msgId);
+      // Reload: restore the stored conversation instead of generating a new one
+      let resumed = null;
+      try {
+        resumed = await fetchResumedChat();
+      } catch (resumeError) {
+        console.warn("Kunde inte återuppta chatten, startar ny:", resumeError);
+      }
+      if (resumed && resumed.messages.length > 0) {
+        setLatestMessageId(restoreTranscript(resumed));
+        setTextCompletion(1);
+        return;
+      }
 
-      setMessages([{
-        id: msgId,
-        sender: 'assistant',
-        textContent: textContent || "", // Ensure textContent is always a string
-        interactiveElement: interactiveElement // Store parsed element directly
-      }]);
-      // setTextCompletion will be set by SmoothTextDisplay
+      await startNewConversation();
     } catch (error) {
       console.error("Fel vid start av chatt:", error);
       const errorMsgId = generateId();
@@ -792,7 +879,7 @@ const ChatComponent = () => {
     } finally {
       setAiIsThinking(false);
     }
-  }, [underskoterska, delegering, userName, messages.length]); // Include messages.length
+  }, [restoreTranscript, startNewConversation, messages.length]); // Include messages.length
 
   // Initialize chat on component mount
   useEffect(() => {
@@ -829,14 +916,32 @@ const ChatComponent = () => {
     // Scroll after adding user message
     requestAnimationFrame(() => setTimeout(scrollToBottom, 50));
 
+    // Name and answers are kept server-side after "start"
+    const nextTurn = () => ({
+      conversationId: conversationIdRef.current,
+      seq: seqRef.current + 1,
+      message: trimmedText
+    });
+
     try {
-      const response = await axios.post(API_ENDPOINTS.CHAT, {
-        answers: { underskoterska, delegering },
-        message: trimmedText,
-        name: userName
-      });
+      let response;
+      try {
+        response = await postChatTurn(nextTurn());
+      } catch (error) {
+        const code = error?.response?.data?.code;
+        if (code !== 'seq_conflict' && code !== 'bad_seq') throw error;
+        // The server has turns we never saw (e.g. a reply that finished after we gave up
+        // waiting): show its transcript, take its seq and send this message as the next turn
+        const resumed = await fetchResumedChat();
+        if (!resumed) throw error;
+        restoreTranscript(resumed, [newUserMessage]);
+        response = await postChatTurn(nextTurn());
+      }
 
        if (response?.data?.reply) {
+           // Always follow the server's conversation id (it is the source of truth)
+           conversationIdRef.current = response.data.conversationId;
+           seqRef.current = response.data.seq;
            const { textContent, interactiveElement } = response.data.reply;
            const newMessageId = generateId();
            setLatestMessageId(newMessageId); // Set the new latest ID
@@ -852,6 +957,15 @@ const ChatComponent = () => {
         }
 
     } catch (error) {
+      if (error?.response?.data?.code === 'unknown_conversation') {
+        // The session no longer holds this conversation (expired or replaced): start over
+        try {
+          await startNewConversation();
+          return;
+        } catch (startError) {
+          console.error("Fel vid omstart av chatt:", startError);
+        }
+      }
       console.error("Fel vid anrop till API:", error);
       const errorMsgId = generateId();
       setLatestMessageId(errorMsgId);
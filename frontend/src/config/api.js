@@ -9,6 +9,12 @@ const API_ENDPOINTS = {
   // Chat endpoint
   CHAT: `${API_BASE_URL}/api/chat`,
 
+  // Versionerat chat endpoint (conversationId + seq, idempotenta retries)
+  CHAT_V2: `${API_BASE_URL}/api/v2/chat`,
+
+  // Återuppta sparad konversation vid omladdning (inget modellanrop)
+  CHAT_RESUME: `${API_BASE_URL}/api/chat/resume`,
+
   // User endpoint
   USER: `${API_BASE_URL}/api/user`,
 